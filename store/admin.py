@@ -1,10 +1,12 @@
 from django.contrib import admin, messages
-from django.db.models.aggregates import Count
+from django.db import transaction
 
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
 
 from . import models
+from .cache import bump_generation
+from .payments import update_payment_statuses
 
 # Register your models here.
 
@@ -57,6 +59,8 @@ class ProductAdmin(admin.ModelAdmin):
     @admin.action(description='Clear inventory')
     def clear_inventory(self, request, queryset):
         update_count = queryset.update(inventory=0)
+        # update() skips post_save, so cached product responses are not invalidated
+        transaction.on_commit(lambda: bump_generation('product'))
         self.message_user(
             request,
             f'{update_count} product successfully Updated.',
@@ -93,6 +97,17 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [orderItemInline]
     list_display = ['id', 'placed_at', 'customer']
     
+    def save_model(self, request, obj, form, change):
+        if not change or 'payment_status' not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        # Through store.payments, like the API, so summaries and rollups
+        # follow the change
+        with transaction.atomic():
+            update_payment_statuses({obj.id: obj.payment_status})
+            fields = [name for name in form.changed_data if name != 'payment_status']
+            if fields:
+                obj.save(update_fields=fields)
+    
 
 
 @admin.register(models.Collection)
@@ -108,9 +123,4 @@ class CollectionAdmin(admin.ModelAdmin):
                + urlencode({
                    'collection__id':str(collection.id)
                }))
-        return format_html('<a href="{}">{}</a>',url, collection.products_count)
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            products_count = Count('products')
-        )
\ No newline at end of file
+        return format_html('<a href="{}">{}</a>',url, collection.products_count)
\ No newline at end of file
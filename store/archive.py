@@ -0,0 +1,63 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+
+def archive_orders(days=None, batch_size=None):
+    """
+    Moves orders with a completed payment placed more than `days` days ago
+    (STORE_ORDER_ARCHIVE_AFTER_DAYS by default), with their items, to the
+    archive tables, `batch_size` orders per transaction, and returns the
+    number of order and order item rows moved.
+
+    Customer summaries and sales rollups are left as they are, they keep
+    counting archived orders.
+    """
+    days = settings.STORE_ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.STORE_ORDER_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    moved = {'orders': 0, 'items': 0}
+    while True:
+        with transaction.atomic():
+            # Locked like payment status updates do, an order whose payment
+            # changes meanwhile is either archived before or skipped after
+            orders = list(
+                Order.objects
+                .select_for_update()
+                .filter(payment_status=Order.PAYMENT_STATUS_COMPLETE, placed_at__lt=cutoff)
+                .order_by('id')[:batch_size]
+            )
+            if not orders:
+                break
+            order_ids = [order.id for order in orders]
+            items = list(OrderItem.objects.filter(order_id__in=order_ids).order_by('id'))
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(id=order.id, placed_at=order.placed_at,
+                              payment_status=order.payment_status, customer_id=order.customer_id)
+                for order in orders
+            ])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(id=item.id, order_id=item.order_id, product_id=item.product_id,
+                                  quantity=item.quantity, unit_price=item.unit_price)
+                for item in items
+            ])
+            # Items first, Order protects them. The orders' events and
+            # idempotency keys go with them.
+            OrderItem.objects.filter(order_id__in=order_ids).delete()
+            Order.objects.filter(id__in=order_ids).delete()
+        moved['orders'] += len(orders)
+        moved['items'] += len(items)
+        if len(orders) < batch_size:
+            break
+
+    logger.info('Archived %d order(s) and %d order item(s)', moved['orders'], moved['items'])
+    return moved
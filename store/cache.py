@@ -0,0 +1,92 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+HITS_KEY = 'store:response-cache:hits'
+MISSES_KEY = 'store:response-cache:misses'
+
+
+def _generation_key(model_name):
+    return f'store:generation:{model_name}'
+
+
+def _initial_generation():
+    # Starting from the clock instead of 1 means a generation that was evicted
+    # from the cache can never come back with a value an old entry was keyed on.
+    return int(time.time() * 1000)
+
+
+def _increment(key, initial):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, initial, None):
+            return initial
+        return cache.incr(key)
+
+
+def get_generations(model_names):
+    keys = [_generation_key(name) for name in model_names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model_name):
+    return _increment(_generation_key(model_name), _initial_generation())
+
+
+def get_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
+
+
+def response_cache_key(request, model_names):
+    query = sorted(request.query_params.lists())
+    generations = get_generations(model_names)
+    raw = f'{request.build_absolute_uri(request.path)}|{query}|{generations}'
+    return 'store:response:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Serves anonymous list/retrieve responses from the cache.
+
+    Entries are keyed on the URL, the query parameters and the generation of
+    every model in `cache_models`, so a write to any of them makes the old
+    entries unreachable instead of having to find and delete them.
+    """
+    cache_models = []
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user and request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request, self.cache_models)
+        data = cache.get(key)
+        if data is not None:
+            _increment(HITS_KEY, 1)
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        _increment(MISSES_KEY, 1)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.STORE_RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,519 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .models import Cart, CartItem, Product
+
+
+logger = logging.getLogger(__name__)
+
+
+class CartBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The cart is being updated, please retry.'
+    default_code = 'cart_busy'
+
+
+def get_cart_store():
+    return import_string(settings.STORE_CART_BACKEND)()
+
+
+def parse_cart_id(cart_id):
+    try:
+        return cart_id if isinstance(cart_id, UUID) else UUID(str(cart_id))
+    except ValueError:
+        raise NotFound('No cart with the given ID was found.')
+
+
+class DatabaseCartStore:
+    """Carts read and written straight from the Cart/CartItem tables."""
+
+    def create_cart(self):
+        cart = Cart.objects.create()
+        cart.total_price = Decimal(0)
+        return cart
+
+    def get_cart(self, cart_id, with_items=True, with_total=True):
+        queryset = Cart.objects.all()
+        if with_items:
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=cart_items()))
+        if with_total:
+            queryset = queryset.annotate(
+                total_price=Coalesce(Sum(line_total('items__')), Value(Decimal(0)), output_field=PRICE))
+        return get_object_or_404(queryset, pk=parse_cart_id(cart_id))
+
+    def delete_cart(self, cart_id):
+        Cart.objects.filter(pk=parse_cart_id(cart_id)).delete()
+
+    def get_items(self, cart_id):
+        return cart_items().filter(cart_id=parse_cart_id(cart_id))
+
+    def get_item(self, cart_id, item_id):
+        return get_object_or_404(self.get_items(cart_id), pk=item_id)
+
+    def add_item(self, cart_id, product_id, quantity):
+        """
+        Adds `quantity` of a product to the cart with a single upsert.
+
+        The row is inserted from a SELECT on the cart and product tables, so
+        nothing is written when either is missing, and an existing item has
+        its quantity incremented in the same statement, which keeps
+        concurrent adds of the same product from racing on the
+        (cart, product) unique constraint.
+        """
+        cart_id = parse_cart_id(cart_id)
+        item_table = CartItem._meta.db_table
+        if connection.vendor == 'mysql':
+            conflict = 'ON DUPLICATE KEY UPDATE'
+        else:
+            conflict = 'ON CONFLICT (cart_id, product_id) DO UPDATE SET'
+        returning = connection.features.can_return_columns_from_insert
+        sql = (
+            f'INSERT INTO {item_table} (cart_id, product_id, quantity) '
+            f'SELECT {Cart._meta.db_table}.id, {Product._meta.db_table}.id, %s '
+            f'FROM {Cart._meta.db_table}, {Product._meta.db_table} '
+            f'WHERE {Cart._meta.db_table}.id = %s AND {Product._meta.db_table}.id = %s '
+            f'{conflict} quantity = {item_table}.quantity + %s'
+            + (' RETURNING id, quantity' if returning else '')
+        )
+        params = [
+            quantity,
+            Cart._meta.pk.get_db_prep_value(cart_id, connection),
+            product_id,
+            quantity,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone() if returning else None
+            inserted = cursor.rowcount > 0 or row is not None
+
+        if not inserted:
+            if not Cart.objects.filter(pk=cart_id).exists():
+                raise NotFound('No cart with the given ID was found.')
+            raise Product.DoesNotExist('No product with the given ID was found.')
+        self._touch(cart_id)
+        if row is None:
+            return CartItem.objects.get(cart_id=cart_id, product_id=product_id)
+        item_id, item_quantity = row
+        return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=item_quantity)
+
+    def update_item(self, cart_id, item, quantity):
+        item.quantity = quantity
+        item.save()
+        self._touch(cart_id)
+        return item
+
+    def remove_item(self, cart_id, item):
+        item.delete()
+        self._touch(cart_id)
+
+    def _touch(self, cart_id):
+        Cart.objects.filter(pk=parse_cart_id(cart_id)).update(updated_at=timezone.now())
+
+    def apply_batch(self, cart_id, operations):
+        """
+        Applies a list of add/update/remove operations in one transaction,
+        with at most one bulk_create, one bulk_update and one delete.
+        """
+        cart_id = parse_cart_id(cart_id)
+        with transaction.atomic():
+            # Locking the cart serializes concurrent batches on it
+            cart = get_object_or_404(Cart.objects.select_for_update(), pk=cart_id)
+            existing = {
+                item.product_id: item for item in CartItem.objects
+                .select_for_update()
+                .filter(cart_id=cart_id, product_id__in={op['product_id'] for op in operations})
+            }
+            quantities = {product_id: item.quantity for product_id, item in existing.items()}
+            apply_operations(quantities, operations)
+
+            new, changed, removed = [], [], []
+            for product_id, quantity in quantities.items():
+                item = existing.get(product_id)
+                if item is None:
+                    if quantity:
+                        new.append(CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity))
+                elif not quantity:
+                    removed.append(item.id)
+                elif quantity != item.quantity:
+                    item.quantity = quantity
+                    changed.append(item)
+
+            CartItem.objects.bulk_create(new)
+            CartItem.objects.bulk_update(changed, ['quantity'])
+            if removed:
+                CartItem.objects.filter(id__in=removed).delete()
+            cart.save(update_fields=['updated_at'])
+        return self.get_cart(cart.id)
+
+    def flush(self, cart_id=None):
+        pass
+
+    def discard(self, cart_id):
+        pass
+
+    def changed_since(self, cart_ids, since):
+        # Cart.updated_at is already up to date
+        return set()
+
+
+# Wide enough for quantity (5 digits) times price (6 digits) summed over a
+# large cart.
+PRICE = DecimalField(max_digits=16, decimal_places=2)
+
+
+def line_total(prefix=''):
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}product__price'), output_field=PRICE)
+
+
+def cart_items():
+    """
+    Cart items with their `total_price` computed in the database and only
+    the product columns the cart serializers render.
+    """
+    return CartItem.objects\
+        .select_related('product')\
+        .only('id', 'cart_id', 'quantity', 'product__id', 'product__title', 'product__price')\
+        .annotate(total_price=line_total())
+
+
+def apply_operations(quantities, operations):
+    # Quantities map product ids to the quantity in the cart, 0 once removed.
+    for operation in operations:
+        product_id = operation['product_id']
+        if operation['op'] == 'add':
+            quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+        elif operation['op'] == 'update':
+            quantities[product_id] = operation['quantity']
+        else:
+            quantities[product_id] = 0
+    return quantities
+
+
+class CartItems(list):
+    # Lets cached carts go through serializers written for `cart.items.all()`.
+    def all(self):
+        return self
+
+
+@dataclass
+class CachedCart:
+    id: UUID
+    items: CartItems
+
+    @property
+    def total_price(self):
+        return sum((item.total_price for item in self.items), Decimal(0))
+
+
+@dataclass
+class CachedCartItem:
+    id: int
+    product_id: int
+    product: Product
+    quantity: int
+
+    @property
+    def total_price(self):
+        return self.quantity * self.product.price
+
+
+class CacheCartStore:
+    """
+    Carts kept in the Django cache and written to the Cart/CartItem tables
+    later (write-behind).
+
+    Every change appends the cart id to a dirty log in the cache, `flush()`
+    persists the carts logged since the last flush (run it periodically,
+    see `store.tasks.flush_carts`) and `flush(cart_id)` persists a single
+    cart, which checkout does before reading it from the database.
+
+    Changes to a cart hold a per-cart lock in the cache (`cache.add`) from
+    reading its state to writing it back, so concurrent changes are applied
+    one after the other instead of overwriting each other.
+
+    Item ids are the CartItem ids for lines read from the database and
+    negative ids from a cache counter for new ones, written with the rows
+    on flush, so item URLs stay the same whichever store serves them.
+
+    Carts only live in the cache until flushed, so the cache must never
+    evict entries: backends that cull when full (local memory, file,
+    database) or keep nothing are refused, and Redis needs
+    `maxmemory-policy noeviction`.
+    """
+    dirty_counter_key = 'store:carts:dirty'
+    item_counter_key = 'store:carts:item_ids'
+    flushed_counter_key = 'store:carts:flushed'
+    flush_batch_size = 500
+    # Seconds a lock is held at most (its holder may have died) and waited for
+    lock_timeout = 5
+    lock_wait = 5
+    evicting_backends = (LocMemCache, FileBasedCache, DatabaseCache, DummyCache)
+
+    def __init__(self):
+        if isinstance(caches['default'], self.evicting_backends):
+            raise ImproperlyConfigured(
+                'CacheCartStore needs a cache that never evicts entries, '
+                f'not {type(caches["default"]).__name__}.')
+
+    @property
+    def timeout(self):
+        return settings.STORE_CART_CACHE_TIMEOUT
+
+    def _key(self, cart_id):
+        return f'store:cart:{cart_id}'
+
+    def _dirty_key(self, position):
+        return f'{self.dirty_counter_key}:{position}'
+
+    def _load(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        state = cache.get(self._key(cart_id))
+        if state is None:
+            if not Cart.objects.filter(pk=cart_id).exists():
+                raise NotFound('No cart with the given ID was found.')
+            state = {'items': {}, 'ids': {}}
+            rows = CartItem.objects\
+                .filter(cart_id=cart_id)\
+                .order_by('id')\
+                .values_list('product_id', 'quantity', 'id')
+            for product_id, quantity, item_id in rows:
+                state['items'][product_id] = quantity
+                state['ids'][product_id] = item_id
+            cache.set(self._key(cart_id), state, self.timeout)
+        elif 'ids' not in state:
+            # Cached before item ids were kept
+            self._assign_ids(state)
+            cache.set(self._key(cart_id), state, self.timeout)
+        return cart_id, state
+
+    def _new_item_id(self):
+        # Negative, so it never collides with an id the database hands out
+        cache.add(self.item_counter_key, 0, None)
+        return -cache.incr(self.item_counter_key)
+
+    def _assign_ids(self, state):
+        ids = state.setdefault('ids', {})
+        for product_id in [product_id for product_id in ids if product_id not in state['items']]:
+            del ids[product_id]
+        for product_id in state['items']:
+            if product_id not in ids:
+                ids[product_id] = self._new_item_id()
+
+    @contextmanager
+    def _change(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        key = f'{self._key(cart_id)}:lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not cache.add(key, 1, self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise CartBusy()
+            time.sleep(0.005)
+        try:
+            yield self._load(cart_id)
+        finally:
+            cache.delete(key)
+
+    def _save(self, cart_id, state):
+        self._assign_ids(state)
+        state['updated_at'] = time.time()
+        cache.set(self._key(cart_id), state, self.timeout)
+        cache.add(self.dirty_counter_key, 0, None)
+        position = cache.incr(self.dirty_counter_key)
+        cache.set(self._dirty_key(position), cart_id, self.timeout)
+
+    def _build(self, cart_id, state, with_items=True):
+        items = CartItems()
+        if with_items and state['items']:
+            products = Product.objects\
+                .only('id', 'title', 'price')\
+                .in_bulk(list(state['items']))
+            items.extend(
+                CachedCartItem(id=state['ids'][product_id], product_id=product_id,
+                               product=products[product_id], quantity=quantity)
+                for product_id, quantity in state['items'].items()
+                if product_id in products
+            )
+        return CachedCart(id=cart_id, items=items)
+
+    def create_cart(self):
+        cart_id = Cart._meta.pk.get_default()
+        self._save(cart_id, {'items': {}})
+        return CachedCart(id=cart_id, items=CartItems())
+
+    def get_cart(self, cart_id, with_items=True, with_total=True):
+        cart_id, state = self._load(cart_id)
+        return self._build(cart_id, state, with_items or with_total)
+
+    def delete_cart(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        cache.delete(self._key(cart_id))
+        Cart.objects.filter(pk=cart_id).delete()
+
+    def get_items(self, cart_id):
+        try:
+            return self.get_cart(cart_id).items
+        except NotFound:
+            return CartItems()
+
+    def get_item(self, cart_id, item_id):
+        for item in self.get_items(cart_id):
+            if str(item.id) == str(item_id):
+                return item
+        raise NotFound('No item with the given ID was found.')
+
+    def add_item(self, cart_id, product_id, quantity):
+        with self._change(cart_id) as (cart_id, state):
+            if product_id not in state['items'] and not Product.objects.filter(pk=product_id).exists():
+                raise Product.DoesNotExist('No product with the given ID was found.')
+            state['items'][product_id] = state['items'].get(product_id, 0) + quantity
+            self._save(cart_id, state)
+        return CachedCartItem(id=state['ids'][product_id], product_id=product_id,
+                              product=None, quantity=state['items'][product_id])
+
+    def update_item(self, cart_id, item, quantity):
+        with self._change(cart_id) as (cart_id, state):
+            state['items'][item.product_id] = quantity
+            self._save(cart_id, state)
+        item.quantity = quantity
+        return item
+
+    def remove_item(self, cart_id, item):
+        with self._change(cart_id) as (cart_id, state):
+            state['items'].pop(item.product_id, None)
+            self._save(cart_id, state)
+
+    def apply_batch(self, cart_id, operations):
+        with self._change(cart_id) as (cart_id, state):
+            quantities = apply_operations(dict(state['items']), operations)
+            state['items'] = {
+                product_id: quantity for product_id, quantity in quantities.items() if quantity
+            }
+            self._save(cart_id, state)
+        return self._build(cart_id, state)
+
+    def flush(self, cart_id=None):
+        if cart_id is not None:
+            self._persist(parse_cart_id(cart_id))
+            return
+
+        flushed = cache.get(self.flushed_counter_key, 0)
+        dirty = cache.get(self.dirty_counter_key, 0)
+        for start in range(flushed + 1, dirty + 1, self.flush_batch_size):
+            keys = [
+                self._dirty_key(position)
+                for position in range(start, min(start + self.flush_batch_size, dirty + 1))
+            ]
+            for cart_id in set(cache.get_many(keys).values()):
+                self._persist(cart_id)
+            cache.delete_many(keys)
+        cache.set(self.flushed_counter_key, dirty, None)
+
+    def discard(self, cart_id):
+        cache.delete(self._key(parse_cart_id(cart_id)))
+
+    def changed_since(self, cart_ids, since):
+        # Cart.updated_at only moves on flush, the cached state knows better
+        states = cache.get_many([self._key(cart_id) for cart_id in cart_ids])
+        return {
+            cart_id for cart_id in cart_ids
+            if states.get(self._key(cart_id), {}).get('updated_at', 0) >= since.timestamp()
+        }
+
+    def _persist(self, cart_id):
+        state = cache.get(self._key(cart_id))
+        if state is None:
+            return
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(pk=cart_id)
+            if not created:
+                cart.save(update_fields=['updated_at'])
+            product_ids = set(
+                Product.objects
+                .filter(id__in=list(state['items']))
+                .values_list('id', flat=True)
+            )
+            CartItem.objects\
+                .filter(cart_id=cart_id)\
+                .exclude(product_id__in=product_ids)\
+                .delete()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(id=state['ids'][product_id], cart_id=cart_id,
+                             product_id=product_id, quantity=quantity)
+                    for product_id, quantity in state['items'].items()
+                    if product_id in product_ids
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+
+
+def reap_abandoned_carts(ttl=None, batch_size=None):
+    """
+    Deletes carts not updated for `ttl` seconds (STORE_CART_TTL by default),
+    `batch_size` carts per transaction so no delete holds its locks for
+    long, and returns the number of cart and cart item rows deleted.
+    """
+    ttl = settings.STORE_CART_TTL if ttl is None else ttl
+    batch_size = batch_size or settings.STORE_CART_REAP_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    store = get_cart_store()
+    # Write-behind stores bring updated_at up to date first
+    store.flush()
+    reaped = {'carts': 0, 'items': 0}
+    last = None
+    while True:
+        candidates = Cart.objects.filter(updated_at__lt=cutoff)
+        if last is not None:
+            # Walks past the carts left alone below
+            candidates = candidates.filter(
+                Q(updated_at__gt=last[1]) | Q(updated_at=last[1], id__gt=last[0]))
+        selected = list(
+            candidates
+            .order_by('updated_at', 'id')
+            .values_list('id', 'updated_at')[:batch_size]
+        )
+        if not selected:
+            break
+        last = selected[-1]
+        # Carts still being changed in the store are left alone
+        active = store.changed_since([cart_id for cart_id, _ in selected], cutoff)
+        cart_ids = [cart_id for cart_id, _ in selected if cart_id not in active]
+        with transaction.atomic():
+            # Carts touched since they were selected are left alone
+            _, deleted = Cart.objects\
+                .filter(id__in=cart_ids, updated_at__lt=cutoff)\
+                .delete()
+        for cart_id in cart_ids:
+            store.discard(cart_id)
+        reaped['carts'] += deleted.get(Cart._meta.label, 0)
+        reaped['items'] += deleted.get(CartItem._meta.label, 0)
+        if len(selected) < batch_size:
+            break
+
+    logger.info(
+        'Reaped %d abandoned cart(s) and %d cart item(s)', reaped['carts'], reaped['items'])
+    return reaped
@@ -0,0 +1,111 @@
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Order, OrderEvent
+from .signals import order_created
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+def record_order_created(order):
+    """
+    Records the order_created event in the caller's transaction and
+    dispatches it once that transaction commits.
+
+    Receivers of order_created never run while checkout holds its locks. An
+    event whose dispatch is lost (crashed worker, broker down) stays
+    pending and is picked up by the next `dispatch_order_events()` run, so
+    receivers may see an order more than once but never miss one.
+    """
+    event = OrderEvent.objects.create(order=order)
+    transaction.on_commit(lambda: schedule_dispatch(event.id))
+
+
+def schedule_dispatch(event_id):
+    # Only the event just recorded, older pending ones are left to the
+    # periodic task
+    if settings.STORE_ORDER_EVENT_DISPATCH != 'celery':
+        dispatch_order_events(event_ids=[event_id])
+        return
+    from .tasks import dispatch_order_events as task
+    try:
+        task.delay([event_id])
+    except Exception:
+        # The event stays pending for the periodic task
+        logger.exception('Could not queue the order_created event %s', event_id)
+
+
+def dispatch_order_events(batch_size=None, event_ids=None):
+    """
+    Sends order_created for pending events (only those in `event_ids` when
+    given), `batch_size` at a time, and returns the number of events
+    delivered.
+
+    An event is marked dispatched only when every receiver succeeded, a
+    failing one is retried by later runs up to MAX_ATTEMPTS times, then
+    logged as critical and kept until `replay_order_events()`.
+    """
+    batch_size = batch_size or settings.STORE_ORDER_EVENT_BATCH_SIZE
+    delivered = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Walking forward by id retries failed events on the next run,
+            # not in this one
+            pending = OrderEvent.objects\
+                .filter(dispatched_at__isnull=True, attempts__lt=MAX_ATTEMPTS, id__gt=last_id)\
+                .order_by('id')
+            if event_ids is not None:
+                pending = pending.filter(id__in=event_ids)
+            if connection.features.has_select_for_update_skip_locked:
+                # Concurrent workers take different batches
+                pending = pending.select_for_update(skip_locked=True)
+            events = list(pending[:batch_size])
+            if not events:
+                break
+
+            orders = Order.objects.in_bulk([event.order_id for event in events])
+            now = timezone.now()
+            for event in events:
+                event.attempts += 1
+                responses = order_created.send_robust(OrderEvent, order=orders[event.order_id])
+                errors = [response for _, response in responses if isinstance(response, Exception)]
+                for error in errors:
+                    logger.error(
+                        'order_created receiver failed for order %s', event.order_id, exc_info=error)
+                if not errors:
+                    event.dispatched_at = now
+                    delivered += 1
+                elif event.attempts >= MAX_ATTEMPTS:
+                    logger.critical(
+                        'order_created for order %s failed %d times, giving up on event %s '
+                        'until it is replayed', event.order_id, event.attempts, event.id)
+            OrderEvent.objects.bulk_update(events, ['attempts', 'dispatched_at'])
+            last_id = events[-1].id
+        if len(events) < batch_size:
+            break
+    return delivered
+
+
+def replay_order_events(event_ids=None):
+    """
+    Gives events that failed MAX_ATTEMPTS times (only those in `event_ids`
+    when given) their attempts back, dispatches them and returns the
+    number of events delivered.
+    """
+    failed = OrderEvent.objects.filter(dispatched_at__isnull=True, attempts__gte=MAX_ATTEMPTS)
+    if event_ids is not None:
+        failed = failed.filter(id__in=event_ids)
+    event_ids = list(failed.values_list('id', flat=True))
+    if not event_ids:
+        return 0
+    OrderEvent.objects.filter(id__in=event_ids).update(attempts=0)
+    delivered = dispatch_order_events(event_ids=event_ids)
+    logger.info('Replayed %d order event(s), %d delivered', len(event_ids), delivered)
+    return delivered
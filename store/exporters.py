@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Product, ProductImage
+
+
+EXPORT_FIELDS = ['id', 'title', 'slug', 'description', 'price', 'inventory',
+                 'collection_id', 'collection_title', 'images']
+
+
+def iter_catalog(request, chunk_size=1000):
+    # Walks the table in primary key order, `chunk_size` rows per query.
+    # Seeking on the id keeps memory flat on every backend, including
+    # mysqlclient which buffers whole result sets even for iterator().
+    image_field = ProductImage._meta.get_field('image')
+    last_id = 0
+    while True:
+        rows = list(
+            Product.objects
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values('id', 'title', 'slug', 'description', 'price', 'inventory',
+                    'collection_id', collection_title=F('collection__title'))
+            [:chunk_size]
+        )
+        if not rows:
+            return
+
+        images = {}
+        product_images = ProductImage.objects\
+            .filter(product_id__in=[row['id'] for row in rows])\
+            .order_by('id')\
+            .values_list('product_id', 'image')
+        for product_id, name in product_images:
+            images.setdefault(product_id, []).append(
+                request.build_absolute_uri(image_field.storage.url(name)))
+
+        for row in rows:
+            row['images'] = images.get(row['id'], [])
+            yield row
+        last_id = rows[-1]['id']
+
+
+def write_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def write_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['images'] = ' '.join(row['images'])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+WRITERS = {
+    'ndjson': (write_ndjson, 'application/x-ndjson'),
+    'csv': (write_csv, 'text/csv'),
+}
@@ -1,8 +1,21 @@
-from django_filters.rest_framework import FilterSet
-from .models import Product
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django_filters.rest_framework import FilterSet, NumberFilter
+from rest_framework.filters import SearchFilter
+
+from .cache import get_generations
+from .models import ArchivedOrder, DailyCollectionSales, DailyProductSales, Order, Product
+from .search import get_search_backend, tokenize
 
 
 class ProductFilter (FilterSet):
+    low_inventory_threshold = 10
+    # Query parameters that change the page but not the filtered set.
+    facet_ignored_params = ['page', 'cursor', 'count', 'ordering', 'fields', 'omit', 'facets']
+
     class Meta:
         model = Product
         fields = {
@@ -10,4 +23,105 @@ class ProductFilter (FilterSet):
             'price': ['gt', 'lt']
             
         }
-    
\ No newline at end of file
+
+    def get_facets(self):
+        signature = sorted(
+            (key, values) for key, values in self.data.lists()
+            if key not in self.facet_ignored_params
+        )
+        raw = f'{signature}|{get_generations(["product"])}'
+        key = 'store:facets:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.compute_facets()
+            cache.set(key, facets, settings.STORE_RESPONSE_CACHE_TIMEOUT)
+        return facets
+
+    def compute_facets(self):
+        # One GROUP BY collection_id query, every other facet is a
+        # conditional count inside it and summed over the groups.
+        bounds = [None, *settings.STORE_PRODUCT_PRICE_BUCKETS, None]
+        buckets = list(zip(bounds, bounds[1:]))
+        aggregates = {
+            'total': Count('id'),
+            'low_inventory': Count('id', filter=Q(inventory__lt=self.low_inventory_threshold)),
+        }
+        for index, (lower, upper) in enumerate(buckets):
+            condition = Q()
+            if lower is not None:
+                condition &= Q(price__gte=lower)
+            if upper is not None:
+                condition &= Q(price__lt=upper)
+            aggregates[f'price_{index}'] = Count('id', filter=condition)
+
+        rows = list(
+            self.qs
+            .order_by()
+            .values('collection_id')
+            .annotate(**aggregates)
+            .order_by('collection_id')
+        )
+        return {
+            'collection_id': [
+                {'value': row['collection_id'], 'count': row['total']}
+                for row in rows
+            ],
+            'price': [
+                {
+                    'min': lower,
+                    'max': upper,
+                    'count': sum(row[f'price_{index}'] for row in rows)
+                }
+                for index, (lower, upper) in enumerate(buckets)
+            ],
+            'low_inventory': sum(row['low_inventory'] for row in rows),
+        }
+
+
+class OrderFilter(FilterSet):
+    class Meta:
+        model = Order
+        fields = {
+            'payment_status': ['exact'],
+            'placed_at': ['gte', 'lt'],
+        }
+
+
+class ArchivedOrderFilter(OrderFilter):
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
+
+
+class DailyProductSalesFilter(FilterSet):
+    # A plain number, a model choice filter would look the product up
+    product_id = NumberFilter()
+
+    class Meta:
+        model = DailyProductSales
+        fields = {
+            'date': ['gte', 'lte'],
+        }
+
+
+class DailyCollectionSalesFilter(FilterSet):
+    collection_id = NumberFilter()
+
+    class Meta:
+        model = DailyCollectionSales
+        fields = {
+            'date': ['gte', 'lte'],
+        }
+
+
+class ProductSearchFilter(SearchFilter):
+    # Same `?search=` parameter as SearchFilter, answered from a full-text
+    # index and ranked instead of `icontains` over every row.
+    def filter_queryset(self, request, queryset, view):
+        terms = [
+            token
+            for term in self.get_search_terms(request)
+            for token in tokenize(term)
+        ]
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, terms)
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils import encoders
+
+from .models import IdempotencyKey
+
+
+logger = logging.getLogger(__name__)
+
+def _cache_key(user_id, key):
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f'store:idempotency:{user_id}:{digest}'
+
+
+def request_fingerprint(data):
+    if hasattr(data, 'dict'):
+        data = data.dict()
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_stored_response(user_id, key):
+    """
+    Returns {'request_hash', 'response'} stored for the user's key, from the
+    cache when possible, or None for a key not used yet.
+    """
+    stored = cache.get(_cache_key(user_id, key))
+    if stored is None:
+        stored = IdempotencyKey.objects\
+            .filter(user_id=user_id, key=key)\
+            .values('request_hash', 'response')\
+            .first()
+        if stored is not None:
+            cache.set(_cache_key(user_id, key), stored, settings.STORE_IDEMPOTENCY_KEY_TIMEOUT)
+    return stored
+
+
+def store_response(user_id, key, request_hash, response):
+    """
+    Stores the response in the caller's transaction, the (user, key)
+    unique constraint makes a concurrent request with the same key fail
+    instead of creating a second order.
+    """
+    # Encoded as the JSON renderer would, so replays match byte for byte
+    response = json.loads(json.dumps(response, cls=encoders.JSONEncoder))
+    IdempotencyKey.objects.create(
+        user_id=user_id, key=key, request_hash=request_hash,
+        order_id=response['id'], response=response)
+    stored = {'request_hash': request_hash, 'response': response}
+    transaction.on_commit(lambda: cache.set(
+        _cache_key(user_id, key), stored, settings.STORE_IDEMPOTENCY_KEY_TIMEOUT))
+
+
+def prune_idempotency_keys(timeout=None, batch_size=None):
+    """
+    Deletes stored responses older than `timeout` seconds
+    (STORE_IDEMPOTENCY_KEY_TIMEOUT by default, when their cached copy has
+    expired as well), `batch_size` rows per transaction, and returns the
+    number of rows deleted.
+    """
+    timeout = settings.STORE_IDEMPOTENCY_KEY_TIMEOUT if timeout is None else timeout
+    batch_size = batch_size or settings.STORE_IDEMPOTENCY_KEY_PRUNE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    pruned = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects
+            .filter(created_at__lt=cutoff)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+        pruned += deleted
+        if len(ids) < batch_size:
+            break
+
+    logger.info('Pruned %d idempotency key(s)', pruned)
+    return pruned
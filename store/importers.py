@@ -0,0 +1,169 @@
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Collection, Product
+from .search import product_index
+
+
+def iter_lines(stream):
+    # Bytes that are not UTF-8 are kept as lone surrogates, the rows holding
+    # them are then rejected by ProductImporter instead of failing the import
+    for line in iter(stream.readline, b''):
+        yield line.decode('utf-8', 'surrogateescape')
+
+
+def is_utf8(value):
+    try:
+        value.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def read_csv(lines):
+    return csv.DictReader(lines)
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+class ProductImporter:
+    """
+    Upserts products from an iterable of rows, `batch_size` rows at a time.
+
+    Rows are matched to existing products on `slug`. Only one batch is held
+    in memory, every batch is written with one bulk_create and one
+    bulk_update in its own transaction, and invalid rows are reported
+    instead of aborting the import: the first `max_errors` of them in
+    detail, the rest are only counted. A slug repeated within a batch is
+    rejected, a later batch updates the product again.
+    """
+    fields = ['title', 'slug', 'description', 'price', 'inventory', 'collection_id']
+    update_fields = ['title', 'description', 'price', 'inventory', 'collection', 'last_update']
+
+    def __init__(self, batch_size=500, max_errors=None):
+        self.batch_size = batch_size
+        self.max_errors = settings.STORE_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.collection_ids = set(Collection.objects.values_list('id', flat=True))
+        self.created = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors = []
+
+    def run(self, rows):
+        numbered_rows = enumerate(rows, start=1)
+        while True:
+            batch = list(islice(numbered_rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+
+        if self.created or self.updated:
+            # bulk_create/bulk_update send no signals
+            transaction.on_commit(lambda: bump_generation('product'))
+            product_index.clear()
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'rejected': self.rejected,
+            'errors': self.errors,
+        }
+
+    def reject(self, number, errors):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def clean_row(self, row):
+        if not isinstance(row, dict):
+            raise ValidationError({NON_FIELD_ERRORS: ['Expected an object with the product fields.']})
+        if not all(is_utf8(value) for value in row.values() if isinstance(value, str)):
+            raise ValidationError({NON_FIELD_ERRORS: ['The row is not valid UTF-8.']})
+        product = Product(**{
+            field: row.get(field) if row.get(field) != '' else None
+            for field in self.fields
+        })
+        errors = {}
+        try:
+            product.full_clean(exclude=['collection'], validate_unique=False)
+        except ValidationError as error:
+            errors = error.message_dict
+        try:
+            if int(product.collection_id) not in self.collection_ids:
+                raise ValueError
+            product.collection_id = int(product.collection_id)
+        except (TypeError, ValueError):
+            errors['collection_id'] = ['No collection with the given ID was found.']
+        if errors:
+            raise ValidationError(errors)
+        return product
+
+    def import_batch(self, batch):
+        products = {}
+        numbers = {}
+        for number, row in batch:
+            try:
+                product = self.clean_row(row)
+            except ValidationError as error:
+                self.reject(number, error.message_dict)
+                continue
+            if product.slug in products:
+                self.reject(number, {'slug': [f'Row {numbers[product.slug]} has the same slug.']})
+                continue
+            products[product.slug] = product
+            numbers[product.slug] = number
+        if not products:
+            return
+
+        with transaction.atomic():
+            existing = {
+                slug: (product_id, collection_id)
+                for product_id, slug, collection_id in Product.objects
+                .filter(slug__in=products)
+                .order_by('-id')
+                .values_list('id', 'slug', 'collection_id')
+            }
+            now = timezone.now()
+            new, changed = [], []
+            counts = Counter()
+            for slug, product in products.items():
+                if slug in existing:
+                    product.id, previous_collection_id = existing[slug]
+                    product.last_update = now
+                    changed.append(product)
+                    counts[previous_collection_id] -= 1
+                else:
+                    new.append(product)
+                counts[product.collection_id] += 1
+
+            Product.objects.bulk_create(new)
+            Product.objects.bulk_update(changed, self.update_fields)
+            for collection_id, delta in counts.items():
+                if delta:
+                    Collection.objects.filter(pk=collection_id)\
+                        .update(products_count=F('products_count') + delta)
+
+        self.created += len(new)
+        self.updated += len(changed)
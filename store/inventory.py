@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from .cache import bump_generation
+from .models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # {product_id: units available} for every line that cannot be filled
+        self.shortages = shortages
+        super().__init__(shortages)
+
+
+def reserve_stock(lines):
+    """
+    Takes `lines` ({product_id: quantity}) out of Product.inventory, all or
+    nothing, inside the caller's transaction.
+
+    The product rows are locked in id order, so concurrent checkouts over
+    overlapping products queue up instead of deadlocking. The stock is then
+    taken with one UPDATE whose WHERE clause requires `inventory >= quantity`
+    for every line. Raises InsufficientStock, leaving inventory untouched,
+    when any line falls short.
+    """
+    if not lines:
+        return
+    product_ids = sorted(lines)
+    available = dict(
+        Product.objects
+        .select_for_update()
+        .filter(id__in=product_ids)
+        .order_by('id')
+        .values_list('id', 'inventory')
+    )
+    shortages = {
+        product_id: available.get(product_id, 0)
+        for product_id in product_ids
+        if available.get(product_id, 0) < lines[product_id]
+    }
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    in_stock = Q()
+    for product_id in product_ids:
+        in_stock |= Q(id=product_id, inventory__gte=lines[product_id])
+    updated = Product.objects.filter(in_stock).update(inventory=Case(*[
+        When(id=product_id, then=F('inventory') - quantity)
+        for product_id, quantity in lines.items()
+    ]))
+    if updated != len(lines):
+        # Only reachable where select_for_update() takes no lock (SQLite)
+        raise InsufficientStock({
+            product_id: inventory for product_id, inventory in
+            Product.objects.filter(id__in=product_ids).values_list('id', 'inventory')
+            if inventory < lines[product_id]
+        })
+
+    # update() sends no signals, cached product responses show inventory
+    transaction.on_commit(lambda: bump_generation('product'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from store.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Moves completed orders older than STORE_ORDER_ARCHIVE_AFTER_DAYS days to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Age in days of the oldest orders kept.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        moved = archive_orders(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved['orders']} order(s) and {moved['items']} order item(s) archived."))
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from store.rollups import backfill_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily product and collection sales rollups from the order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day (YYYY-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day (YYYY-MM-DD).')
+        parser.add_argument('--days', type=int, default=7, help='Days per transaction.')
+
+    def handle(self, *args, **options):
+        written = backfill_sales(options['since'], options['until'], options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{written} daily product row(s) written.'))
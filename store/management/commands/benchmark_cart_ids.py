@@ -0,0 +1,87 @@
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from store.identifiers import uuid7
+from store.models import Cart
+
+
+GENERATORS = {
+    'uuid4': uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares insert throughput and table/index size of uuid4 and uuid7 '
+        'cart ids, using scratch copies of the cart table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for name, generate in GENERATORS.items():
+            table = f'store_cart_benchmark_{name}'
+            self.create_table(table)
+            try:
+                elapsed = self.fill(table, generate, options['rows'], options['batch_size'])
+                size = self.table_size(table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(table)}')
+
+            size = f'{size / 1024 / 1024:.1f} MiB' if size is not None else 'n/a'
+            self.stdout.write(
+                f'{name}: {options["rows"] / elapsed:,.0f} rows/s, table and indexes {size}')
+
+    def create_table(self, table):
+        id_type = Cart._meta.pk.db_type(connection)
+        timestamp_type = Cart._meta.get_field('created_at').db_type(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {connection.ops.quote_name(table)} '
+                f'(id {id_type} NOT NULL PRIMARY KEY, created_at {timestamp_type} NOT NULL)')
+
+    def fill(self, table, generate, rows, batch_size):
+        sql = f'INSERT INTO {connection.ops.quote_name(table)} (id, created_at) VALUES (%s, %s)'
+        id_field = Cart._meta.pk
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            batch = [
+                (id_field.get_db_prep_value(generate(), connection), now)
+                for _ in range(min(batch_size, rows - start))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        return time.perf_counter() - started
+
+    def table_size(self, table):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(table)}')
+                cursor.fetchall()
+                cursor.execute(
+                    'SELECT data_length + index_length FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+                return cursor.fetchone()[0]
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+                return cursor.fetchone()[0]
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        'SELECT SUM(pgsize) FROM dbstat WHERE name = %s '
+                        'OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                        [table, table])
+                except DatabaseError:
+                    # dbstat is an optional compile-time extension
+                    return None
+                return cursor.fetchone()[0]
+        return None
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.carts import get_cart_store
+
+
+class Command(BaseCommand):
+    help = 'Writes carts changed in the cart store since the last flush to the database.'
+
+    def handle(self, *args, **options):
+        get_cart_store().flush()
+        self.stdout.write(self.style.SUCCESS('Carts flushed.'))
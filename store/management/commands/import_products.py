@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.importers import READERS, ProductImporter, iter_lines
+
+
+class Command(BaseCommand):
+    help = 'Upserts products (matched on slug) from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=list(READERS))
+        parser.add_argument('--batch-size', type=int, default=settings.STORE_IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            file_format = 'csv'
+        read = READERS[file_format]
+
+        with open(options['path'], 'rb') as file:
+            report = ProductImporter(options['batch_size']).run(read(iter_lines(file)))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} product(s) created, {report['updated']} updated, "
+            f"{report['rejected']} row(s) rejected."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Deletes stored Idempotency-Key responses older than STORE_IDEMPOTENCY_KEY_TIMEOUT seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, help='Age in seconds of the oldest responses kept.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        pruned = prune_idempotency_keys(options['ttl'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{pruned} idempotency key(s) deleted.'))
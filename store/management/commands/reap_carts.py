@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from store.carts import reap_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Deletes carts that have not been updated for STORE_CART_TTL seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, help='Idle seconds before a cart is deleted.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        reaped = reap_abandoned_carts(options['ttl'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{reaped['carts']} cart(s) and {reaped['items']} cart item(s) deleted."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.summaries import rebuild_order_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the customer order summaries from the order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = rebuild_order_summaries(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{written} customer summary(ies) rebuilt.'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from store.models import Collection, Product
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Collection.products_count from the product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Locking the collections first blocks concurrent product writes
+            # on them (foreign key checks) until the counts are stored.
+            collections = list(
+                Collection.objects
+                .select_for_update()
+                .only('id', 'products_count')
+                .order_by('id')
+            )
+            counts = dict(
+                Product.objects
+                .order_by()
+                .values('collection_id')
+                .annotate(count=Count('id'))
+                .values_list('collection_id', 'count')
+            )
+            drifted = []
+            for collection in collections:
+                expected = counts.get(collection.id, 0)
+                if collection.products_count != expected:
+                    collection.products_count = expected
+                    drifted.append(collection)
+            Collection.objects.bulk_update(
+                drifted, ['products_count'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(drifted)} collection(s) recounted.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.events import replay_order_events
+
+
+class Command(BaseCommand):
+    help = 'Dispatches again the order events that failed too many times.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', type=int, help='Only these events.')
+
+    def handle(self, *args, **options):
+        delivered = replay_order_events(options['event_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'{delivered} order event(s) delivered.'))
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX store_product_fulltext '
+            'ON store_product (title, description)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'DROP INDEX store_product_fulltext ON store_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_alter_orderitem_order_productimage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 05:40
+
+import store.validator
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_products_count(apps, schema_editor):
+    Collection = apps.get_model('store', 'Collection')
+    Product = apps.get_model('store', 'Product')
+    counts = Product.objects\
+        .filter(collection_id=OuterRef('pk'))\
+        .order_by()\
+        .values('collection_id')\
+        .annotate(count=Count('id'))\
+        .values('count')
+    Collection.objects.update(
+        products_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_product_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_products_count, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(upload_to='store/images', validators=[store.validator.validated_file_size]),
+        ),
+    ]
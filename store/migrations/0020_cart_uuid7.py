@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 05:54
+
+import store.identifiers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='id',
+            field=models.UUIDField(default=store.identifiers.uuid7, primary_key=True, serialize=False),
+        ),
+    ]
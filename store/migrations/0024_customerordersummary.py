@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_order_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerOrderSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_summary', serialize=False, to='store.customer')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_order_at', models.DateTimeField(null=True)),
+                ('products', models.JSONField(default=dict)),
+            ],
+        ),
+    ]
@@ -2,8 +2,8 @@ from django.db import models
 from django.conf import settings
 from django.contrib import admin
 from django.core.validators import MinValueValidator
-from uuid import uuid4
 
+from .identifiers import uuid7
 from .validator import validated_file_size
 
 
@@ -16,12 +16,18 @@ class Collection(models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         'Product', on_delete=models.SET_NULL, null=True, related_name='+')
+    # Maintained by the Product signal handlers, fixed up by the
+    # recount_collection_products command.
+    products_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title'], name='store_coll_title_idx'),
+        ]
 
 
 class Product(models.Model):
@@ -43,6 +49,15 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            # ProductFilter: collection_id = ? AND price > / < ?
+            models.Index(fields=['collection', 'price'], name='store_prod_coll_price_idx'),
+            # Default ordering and the keyset pagination orderings,
+            # each completed with the (title, id) tie-breaker.
+            models.Index(fields=['title', 'id'], name='store_prod_title_idx'),
+            models.Index(fields=['price', 'title', 'id'], name='store_prod_price_idx'),
+            models.Index(fields=['last_update', 'title', 'id'], name='store_prod_last_update_idx'),
+        ]
     
 
 class ProductImage(models.Model):
@@ -105,6 +120,11 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'Can cancel Order')
         ]
+        indexes = [
+            models.Index(fields=['customer', 'placed_at'], name='store_order_cust_placed_idx'),
+            models.Index(fields=['placed_at'], name='store_order_placed_idx'),
+            models.Index(fields=['payment_status', 'placed_at'], name='store_order_status_placed_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -115,6 +135,99 @@ class OrderItem(models.Model):
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
 
 
+class ArchivedOrder(models.Model):
+    # Completed orders moved out of Order by store.archive, under their
+    # original ids so links to them keep working.
+    id = models.BigIntegerField(primary_key=True)
+    placed_at = models.DateTimeField()
+    payment_status = models.CharField(max_length=1, choices=Order.PAYMENT_STATUS_CHOICES)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='archived_orders')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'placed_at'], name='store_arch_order_cust_idx'),
+            models.Index(fields=['placed_at'], name='store_arch_order_placed_idx'),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.PROTECT, related_name='items')
+    product = models.ForeignKey(
+        Product, on_delete=models.PROTECT, related_name='archived_orderitem')
+    quantity = models.PositiveSmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+
+class OrderEvent(models.Model):
+    # Outbox of order_created notifications, written in the checkout
+    # transaction and dispatched after it commits (see store.events).
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dispatched_at', 'id'], name='store_orderevent_pending_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    # Response of an order created with an Idempotency-Key header, replayed
+    # to retries of the same request (see store.idempotency).
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='+')
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = [['user', 'key']]
+
+
+class CustomerOrderSummary(models.Model):
+    # Kept up to date as orders are placed and paid (see store.summaries),
+    # spend and products only count orders with a completed payment.
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='order_summary')
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True)
+    # {product_id: [title, quantity]}
+    products = models.JSONField(default=dict)
+
+
+class DailyProductSales(models.Model):
+    # Completed-payment sales per day the order was placed, kept up to date
+    # by store.rollups; analytics reads these instead of OrderItem.
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [['date', 'product']]
+        indexes = [
+            models.Index(fields=['product', 'date'], name='store_dps_product_date_idx'),
+        ]
+
+
+class DailyCollectionSales(models.Model):
+    date = models.DateField()
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='+')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [['date', 'collection']]
+        indexes = [
+            models.Index(fields=['collection', 'date'], name='store_dcs_collection_date_idx'),
+        ]
+
+
 class Address(models.Model):
     street = models.CharField(max_length=255)
     city = models.CharField(max_length=255)
@@ -123,8 +236,10 @@ class Address(models.Model):
 
 
 class Cart(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid4)
+    id = models.UUIDField(primary_key=True, default=uuid7)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Last time the cart or its items changed, abandoned carts are reaped on it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class CartItem(models.Model):
@@ -1,5 +1,157 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.response import Response
+
 
 class DefaultPagination(PageNumberPagination):
     page_size = 10
-    
\ No newline at end of file
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering instead of the first
+    field plus an offset, so every page is a `WHERE (...) > (...) LIMIT n`
+    and costs the same as the first one.
+
+    The ordering comes from the view's OrderingFilter (or `ordering`) and is
+    always completed with `tie_breakers` to make the position unique.
+    The total count is skipped unless the client asks for it with `?count=true`.
+    """
+    page_size = 10
+    ordering = ('title', 'id')
+    tie_breakers = ('title', 'id')
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.order_by().count()
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.get_seek_filter(queryset.model, current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        names = [field.lstrip('-') for field in ordering]
+        for field in self.tie_breakers:
+            if field.lstrip('-') not in names:
+                ordering.append(field)
+        return tuple(ordering)
+
+    def get_seek_filter(self, model, position, reverse):
+        try:
+            raw_values = json.loads(position)
+            if len(raw_values) != len(self.ordering):
+                raise ValueError
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(raw)
+                for field, raw in zip(self.ordering, raw_values)
+            ]
+        except (TypeError, ValueError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # (a, b, c) > (x, y, z) expanded so that each column can have its
+        # own direction: a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        seek = None
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = {name + ('__lt' if descending else '__gt'): values[index]}
+            equal = {
+                previous.lstrip('-'): values[i]
+                for i, previous in enumerate(self.ordering[:index])
+            }
+            term = Q(**equal, **lookup)
+            seek = term if seek is None else seek | term
+        return seek
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return json.dumps(values)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class OrderPagination(KeysetPagination):
+    # Newest first, walking the (customer, placed_at) and placed_at indexes
+    ordering = ('-placed_at', '-id')
+    tie_breakers = ('-id',)
+
+
+class SalesPagination(KeysetPagination):
+    page_size = 100
+    ordering = ('-date', 'id')
+    tie_breakers = ('id',)
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else '-' + field
+        for field in ordering
+    )
@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Order
+from .signals import payment_status_changed
+
+
+def update_payment_statuses(statuses, batch_size=1000):
+    """
+    Sets the payment status of many orders ({order_id: payment_status}) in
+    one transaction, `batch_size` orders at a time.
+
+    Each batch locks its orders in id order to read their current status,
+    runs one `UPDATE ... WHERE id IN (...)` per target status and sends
+    payment_status_changed once for all of its changed orders. Returns the
+    counts of updated and unchanged orders and the ids that do not exist.
+    """
+    report = {'updated': 0, 'unchanged': 0, 'missing': []}
+    order_ids = sorted(statuses)
+    with transaction.atomic():
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start:start + batch_size]
+            current = {
+                order_id: (customer_id, payment_status)
+                for order_id, customer_id, payment_status in Order.objects
+                .select_for_update()
+                .filter(id__in=batch)
+                .order_by('id')
+                .values_list('id', 'customer_id', 'payment_status')
+            }
+            by_status = defaultdict(list)
+            changes = []
+            for order_id in batch:
+                if order_id not in current:
+                    report['missing'].append(order_id)
+                    continue
+                customer_id, previous = current[order_id]
+                if previous == statuses[order_id]:
+                    report['unchanged'] += 1
+                    continue
+                by_status[statuses[order_id]].append(order_id)
+                changes.append((order_id, customer_id, previous, statuses[order_id]))
+
+            for payment_status, ids in by_status.items():
+                Order.objects.filter(id__in=ids).update(payment_status=payment_status)
+            if changes:
+                payment_status_changed.send(Order, changes=changes)
+            report['updated'] += len(changes)
+    return report
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, DailyCollectionSales, DailyProductSales, \
+    Order, OrderItem
+
+
+def _new_totals():
+    return {'units': 0, 'revenue': Decimal(0)}
+
+
+def _apply(model, field, deltas):
+    """
+    Adds `deltas` ({(date, id): {'units', 'revenue'}}) to the rollup rows,
+    creating missing ones, with the rows locked in key order.
+    """
+    if not deltas:
+        return
+    dates = {date for date, _ in deltas}
+    ids = {key for _, key in deltas}
+
+    def locked_rows():
+        return {
+            (row.date, getattr(row, field)): row for row in model.objects
+            .select_for_update()
+            .filter(date__in=dates, **{f'{field}__in': ids})
+            .order_by('date', field)
+        }
+
+    rows = locked_rows()
+    missing = [
+        model(date=date, **{field: key})
+        for date, key in deltas if (date, key) not in rows
+    ]
+    if missing:
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        rows = locked_rows()
+
+    for key, delta in deltas.items():
+        rows[key].units += delta['units']
+        rows[key].revenue += delta['revenue']
+    model.objects.bulk_update([rows[key] for key in deltas], ['units', 'revenue'])
+
+
+def record_sales(changes):
+    """
+    Adds to (or takes back from) the daily rollups the items of orders whose
+    payment became (or stopped being) complete, on the day the order was
+    placed. `changes` are the payment_status_changed tuples.
+    """
+    complete = Order.PAYMENT_STATUS_COMPLETE
+    signs = {
+        order_id: 1 if new == complete else -1
+        for order_id, _, previous, new in changes
+        if (previous == complete) != (new == complete)
+    }
+    if not signs:
+        return
+
+    products = defaultdict(_new_totals)
+    collections = defaultdict(_new_totals)
+    items = OrderItem.objects\
+        .filter(order_id__in=signs)\
+        .values_list('order_id', 'order__placed_at', 'product_id', 'product__collection_id',
+                     'quantity', 'unit_price')
+    for order_id, placed_at, product_id, collection_id, quantity, unit_price in items:
+        date = timezone.localdate(placed_at)
+        units = signs[order_id] * quantity
+        for totals in (products[date, product_id], collections[date, collection_id]):
+            totals['units'] += units
+            totals['revenue'] += units * unit_price
+    if not products:
+        return
+
+    with transaction.atomic():
+        _apply(DailyProductSales, 'product_id', products)
+        _apply(DailyCollectionSales, 'collection_id', collections)
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def backfill_sales(since=None, until=None, days=7):
+    """
+    Rebuilds the rollups for orders, archived or not, placed from `since`
+    to `until` (inclusive dates, all history by default), `days` days per
+    transaction, and returns the number of product rows written.
+    """
+    if since is None:
+        firsts = [
+            orders.objects.order_by('placed_at').values_list('placed_at', flat=True).first()
+            for orders in (Order, ArchivedOrder)
+        ]
+        firsts = [first for first in firsts if first is not None]
+        if not firsts:
+            return 0
+        since = timezone.localdate(min(firsts))
+    until = until or timezone.localdate()
+
+    written = 0
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=days - 1), until)
+        products = defaultdict(_new_totals)
+        collections = defaultdict(_new_totals)
+        for order_items in (OrderItem, ArchivedOrderItem):
+            # A datetime range, unlike __date, can use the placed_at index
+            paid = order_items.objects\
+                .filter(order__placed_at__gte=_start_of_day(start),
+                        order__placed_at__lt=_start_of_day(end + timedelta(days=1)),
+                        order__payment_status=Order.PAYMENT_STATUS_COMPLETE)\
+                .order_by()\
+                .annotate(date=TruncDate('order__placed_at'))
+            for key, totals in (('product_id', products), ('product__collection_id', collections)):
+                rows = paid\
+                    .values('date', key)\
+                    .annotate(units=Sum('quantity'), revenue=Sum(F('quantity') * F('unit_price')))
+                for row in rows:
+                    totals[row['date'], row[key]]['units'] += row['units']
+                    totals[row['date'], row[key]]['revenue'] += row['revenue']
+        product_rows = [
+            DailyProductSales(date=date, product_id=product_id, **totals)
+            for (date, product_id), totals in products.items()
+        ]
+        collection_rows = [
+            DailyCollectionSales(date=date, collection_id=collection_id, **totals)
+            for (date, collection_id), totals in collections.items()
+        ]
+        with transaction.atomic():
+            DailyProductSales.objects.filter(date__gte=start, date__lte=end).delete()
+            DailyCollectionSales.objects.filter(date__gte=start, date__lte=end).delete()
+            DailyProductSales.objects.bulk_create(product_rows)
+            DailyCollectionSales.objects.bulk_create(collection_rows)
+        written += len(product_rows)
+        start = end + timedelta(days=1)
+    return written
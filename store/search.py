@@ -0,0 +1,175 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, Value, When
+
+from .models import Product
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+class MatchAgainst(Func):
+    # Needs a FULLTEXT index on exactly the same columns (see migration 0016).
+    output_field = FloatField()
+    template = 'MATCH (%(expressions)s) AGAINST (%%s IN BOOLEAN MODE)'
+
+    def __init__(self, *columns, query):
+        super().__init__(*columns)
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, **extra_context)
+        return sql, (*params, self.query)
+
+
+class ProductIndex:
+    """
+    In-process inverted index over product title and description.
+
+    It is loaded from the database on the first search and then kept up to
+    date by the Product post_save/post_delete handlers, so it is meant for
+    SQLite, tests and single process setups.
+    """
+    field_weights = {'title': 2.0, 'description': 1.0}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            self._vocabulary = None
+            self._loaded = False
+
+    def update(self, product):
+        with self._lock:
+            if self._loaded:
+                self._add(product.id, {
+                    'title': product.title,
+                    'description': product.description
+                })
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(product_id)
+
+    def search(self, terms):
+        self._load()
+        with self._lock:
+            scores = None
+            documents = max(len(self._documents), 1)
+            for term in terms:
+                term_scores = defaultdict(float)
+                for token in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + documents / len(postings))
+                    for product_id, weight in postings.items():
+                        term_scores[product_id] += weight * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+                if not scores:
+                    return {}
+            return dict(scores or {})
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = Product.objects.values('id', 'title', 'description').iterator(chunk_size=2000)
+            for row in rows:
+                self._add(row['id'], row)
+            self._loaded = True
+
+    def _add(self, product_id, fields):
+        self._remove(product_id)
+        weights = Counter()
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field)):
+                weights[token] += weight
+        for token, weight in weights.items():
+            self._postings[token][product_id] = weight
+        self._documents[product_id] = set(weights)
+        self._vocabulary = None
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+        self._vocabulary = None
+
+    def _expand(self, term):
+        # Every term is matched as a prefix, like the `term*` operator of the
+        # native backend.
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        tokens = []
+        index = bisect_left(self._vocabulary, term)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(term):
+            tokens.append(self._vocabulary[index])
+            index += 1
+        return tokens
+
+
+product_index = ProductIndex()
+
+
+class MemorySearchBackend:
+    def search(self, queryset, terms):
+        # Every match is ranked, so counts and pages cover all of them. The
+        # products sharing a score (most do, scores only depend on term
+        # weights) share one `WHEN id IN (...)`.
+        scores = product_index.search(terms)
+        if not scores:
+            return queryset.none()
+        by_score = defaultdict(list)
+        for product_id, score in scores.items():
+            by_score[round(score, 6)].append(product_id)
+        rank = Case(
+            *[When(id__in=product_ids, then=Value(score)) for score, product_ids in by_score.items()],
+            output_field=FloatField()
+        )
+        return queryset\
+            .filter(id__in=list(scores))\
+            .annotate(search_rank=rank)\
+            .order_by('-search_rank', 'title', 'id')
+
+
+class DatabaseSearchBackend:
+    def search(self, queryset, terms):
+        query = ' '.join(f'+{term}*' for term in terms)
+        return queryset\
+            .annotate(search_rank=MatchAgainst(F('title'), F('description'), query=query))\
+            .filter(search_rank__gt=0)\
+            .order_by('-search_rank', 'title', 'id')
+
+
+def get_search_backend():
+    # Only MySQL has a native index wired up, every other database falls
+    # back to the in-process index.
+    name = getattr(settings, 'STORE_SEARCH_BACKEND', 'database')
+    if name == 'database' and connection.vendor == 'mysql':
+        return DatabaseSearchBackend()
+    return MemorySearchBackend()
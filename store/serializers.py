@@ -1,12 +1,43 @@
 from decimal import Decimal
 
-from django.db import transaction
+from django.db import connection, transaction
 
 from rest_framework import serializers
-
-from .signals import order_created
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import RelatedField
+
+from .carts import get_cart_store
+from .inventory import InsufficientStock, reserve_stock
+from .summaries import top_products
+from .events import record_order_created
+from .payments import update_payment_statuses
 from .models import Product, Collection, Review,\
-    Cart, CartItem, Customer, Order, OrderItem, ProductImage
+    Cart, CartItem, Customer, CustomerOrderSummary, DailyCollectionSales, DailyProductSales,\
+    Order, OrderItem, ProductImage
+
+
+def get_sparse_fields(request, names):
+    # `?fields=a,b` keeps only the listed fields, `?omit=a,b` drops them.
+    # Writes always use every field.
+    keep = set(names)
+    if request is None or request.method not in SAFE_METHODS:
+        return keep
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if fields:
+        keep &= {name.strip() for name in fields.split(',')}
+    if omit:
+        keep -= {name.strip() for name in omit.split(',')}
+    return keep
+
+
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = get_sparse_fields(self.context.get('request'), self.fields)
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
 
 
 class CollectionSerializer(serializers.ModelSerializer):
@@ -27,18 +58,73 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         
 
-class ProductSerializer(serializers.ModelSerializer):
+TAX_RATE = Decimal(1.1)
+
+
+class ProductListSerializer(serializers.ListSerializer):
+    # Read-only fast path: when the view hands over `values(*columns)` rows
+    # instead of model instances, build the exact same output as
+    # ProductSerializer without instances, nested serializers or a method
+    # call per row. Images come from one grouped query.
+    columns = ['id', 'title', 'description', 'slug', 'inventory', 'price',
+               'collection_id', 'last_update']
+
+    def to_representation(self, data):
+        rows = list(data)
+        if not rows or not isinstance(rows[0], dict):
+            return super().to_representation(rows)
+
+        fields = list(self.child._readable_fields)
+        names = [field.field_name for field in fields]
+        images = self.get_images(rows) if 'images' in names else {}
+
+        ret = []
+        for row in rows:
+            item = {}
+            for field in fields:
+                name = field.field_name
+                if name == 'images':
+                    item[name] = images.get(row['id'], [])
+                elif name == 'price_with_tax':
+                    item[name] = row['price'] * TAX_RATE
+                elif isinstance(field, RelatedField):
+                    item[name] = row[field.source + '_id']
+                else:
+                    value = row[field.source]
+                    item[name] = None if value is None else field.to_representation(value)
+            ret.append(item)
+        return ret
+
+    def get_images(self, rows):
+        image_field = self.child.fields['images'].child.fields['image']
+        model_field = ProductImage._meta.get_field('image')
+        images = {}
+        queryset = ProductImage.objects\
+            .filter(product_id__in=[row['id'] for row in rows])\
+            .order_by('id')\
+            .values_list('id', 'product_id', 'image')
+        for image_id, product_id, name in queryset:
+            file = model_field.attr_class(None, model_field, name)
+            images.setdefault(product_id, []).append({
+                'id': image_id,
+                'image': image_field.to_representation(file)
+            })
+        return images
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     
     class Meta:
         model = Product
         fields = ['id', 'title', 'description', 'slug','inventory', 'price',
                   'price_with_tax', 'collection','images' ]
+        list_serializer_class = ProductListSerializer
 
     price_with_tax = serializers.SerializerMethodField(method_name='calculate_tax')
     
     def calculate_tax(self, product:Product):
-        return product.price * Decimal(1.1)
+        return product.price * TAX_RATE
 
 
 class ReviewSerializers(serializers.ModelSerializer):
@@ -63,20 +149,21 @@ class CartItemSerializers(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField()
     
     def get_total_price(self, cart_item:CartItem):
-        return cart_item.quantity * cart_item.product.price
+        # Computed by the cart store
+        return cart_item.total_price
     
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'quantity', 'total_price']
 
 
-class CartSerializers(serializers.ModelSerializer):
+class CartSerializers(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     items = CartItemSerializers(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
     
     def get_total_price(self, cart):
-        return sum([ item.quantity * item.product.price for item in cart.items.all()])
+        return cart.total_price
     
     class Meta:
         model = Cart
@@ -86,24 +173,17 @@ class CartSerializers(serializers.ModelSerializer):
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
     
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('No product with the given ID was found.')
-        return value
-    
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
         
+        # The product is checked by the store's upsert, not by a separate query
         try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
-       
+            self.instance = get_cart_store().add_item(cart_id, product_id, quantity)
+        except Product.DoesNotExist:
+            raise serializers.ValidationError(
+                {'product_id': ['No product with the given ID was found.']})
         return self.instance
     
     class Meta:
@@ -115,6 +195,32 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ['quantity']
+
+
+class CartItemBatchListSerializer(serializers.ListSerializer):
+    def validate(self, operations):
+        product_ids = {operation['product_id'] for operation in operations}
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('id', flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                {'product_id': [f'No product with the given ID was found: {product_id}.'
+                                for product_id in missing]})
+        return operations
+
+
+class CartItemOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(['add', 'update', 'remove'], default='add')
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, required=False)
+    
+    def validate(self, data):
+        if data['op'] != 'remove' and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': ['This field is required.']})
+        return data
+    
+    class Meta:
+        list_serializer_class = CartItemBatchListSerializer
         
 
 class CustomerSerializers(serializers.ModelSerializer):
@@ -125,6 +231,29 @@ class CustomerSerializers(serializers.ModelSerializer):
         fields = ['id', 'user_id', 'phone', 'birth_date', 'membership']
 
 
+class CustomerOrderSummarySerializer(serializers.ModelSerializer):
+    top_products = serializers.SerializerMethodField()
+    
+    def get_top_products(self, summary):
+        return top_products(summary)
+    
+    class Meta:
+        model = CustomerOrderSummary
+        fields = ['order_count', 'lifetime_spend', 'last_order_at', 'top_products']
+
+
+class DailyProductSalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyProductSales
+        fields = ['date', 'product_id', 'units', 'revenue']
+
+
+class DailyCollectionSalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyCollectionSales
+        fields = ['date', 'collection_id', 'units', 'revenue']
+
+
 class OrderItemSerializers(serializers.ModelSerializer):
     product = SimpleProductSerializer()
     class Meta:
@@ -132,7 +261,7 @@ class OrderItemSerializers(serializers.ModelSerializer):
         fields = ['id', 'product', 'unit_price','quantity']
 
 
-class OrderSerializers(serializers.ModelSerializer):
+class OrderSerializers(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializers(many=True)
     class Meta:
         model = Order
@@ -140,43 +269,97 @@ class OrderSerializers(serializers.ModelSerializer):
 
 
 class UpdateOrderSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        # Locked read, UPDATE and payment_status_changed in one transaction,
+        # so concurrent updates never count a payment twice
+        if 'payment_status' in validated_data:
+            update_payment_statuses({instance.id: validated_data['payment_status']})
+            instance.payment_status = validated_data['payment_status']
+        return instance
+    
     class Meta:
         model = Order
         fields = ['payment_status']
         
         
+class PaymentStatusUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    payment_status = serializers.ChoiceField(Order.PAYMENT_STATUS_CHOICES)
+
+
 class CreateOrderSerializers(serializers.Serializer):
     cart_id = serializers.UUIDField()
     
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError('No cart with tha given id is found')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
-            raise serializers.ValidationError('THe Cart is empty')
+        # Carts kept by a write-behind store are persisted before checkout
+        get_cart_store().flush(cart_id)
         return cart_id
     
+    def get_lines(self, cart_id):
+        # One query locks the cart and reads its lines: no row means no
+        # cart, a single row without an item (LEFT JOIN) an empty one. A
+        # concurrent checkout of the same cart waits here and then finds
+        # it gone.
+        carts = Cart.objects.select_for_update(
+            of=('self',) if connection.features.has_select_for_update_of else ())
+        rows = list(
+            carts
+            .filter(pk=cart_id)
+            .order_by('items__id')
+            .values_list(
+                'items__product_id', 'items__quantity',
+                'items__product__title', 'items__product__price')
+        )
+        if not rows:
+            raise serializers.ValidationError({'cart_id': ['No cart with tha given id is found']})
+        if rows[0][0] is None:
+            raise serializers.ValidationError({'cart_id': ['THe Cart is empty']})
+        return [
+            (Product(id=product_id, title=title, price=price), quantity)
+            for product_id, quantity, title, price in rows
+        ]
+    
     def save(self, **kwargs):
         with transaction.atomic():
             cart_id = self.validated_data['cart_id']
-            customer=Customer.objects.get(user_id=self.context['user_id'])
+            lines = self.get_lines(cart_id)
+            customer_id = Customer.objects\
+                .values_list('id', flat=True)\
+                .get(user_id=self.context['user_id'])
+            
+            try:
+                reserve_stock({product.id: quantity for product, quantity in lines})
+            except InsufficientStock as error:
+                raise serializers.ValidationError({'cart_id': [
+                    f'Not enough stock for product {product_id}: {available} left.'
+                    for product_id, available in error.shortages.items()
+                ]})
             
-            order = Order.objects.create(customer=customer)
-            cart_item = CartItem.objects\
-                .select_related('product')\
-                    .filter(cart_id=cart_id)
+            order = Order.objects.create(customer_id=customer_id)
 
             order_items = [
                 OrderItem(
                     order=order,
-                    product=item.product,
-                    unit_price=item.product.price,
-                    quantity=item.quantity
-                ) for item in cart_item
+                    product=product,
+                    unit_price=product.price,
+                    quantity=quantity
+                ) for product, quantity in lines
             ]
             OrderItem.objects.bulk_create(order_items)
+            if order_items[0].pk is None:
+                # Backends that cannot return ids from a bulk insert (MySQL)
+                ids = dict(OrderItem.objects
+                    .filter(order=order)
+                    .values_list('product_id', 'id'))
+                for item in order_items:
+                    item.pk = ids[item.product_id]
             Cart.objects.filter(pk=cart_id).delete()
-            order_created.send_robust(self.__class__, order=order)
-            return order
+            get_cart_store().discard(cart_id)
+            record_order_created(order)
+        
+        # The response renders the items built here instead of reloading them
+        order._prefetched_objects_cache = {'items': order_items}
+        return order
 
 
 
@@ -1,3 +1,5 @@
 from django.dispatch import Signal
 
-order_created = Signal()
\ No newline at end of file
+order_created = Signal()
+# Sent with changes=[(order_id, customer_id, previous_status, new_status)]
+payment_status_changed = Signal()
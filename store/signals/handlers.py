@@ -1,9 +1,94 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from store.models import Customer
+from store.models import Customer, CustomerOrderSummary, Order, Product, ProductImage, Collection, Promotion
+from store.search import product_index
+from store.cache import bump_generation
+from store.signals import payment_status_changed
+from store.rollups import record_sales
+from store.summaries import record_order_placed, record_payment_status_changes
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
-        customer = Customer.objects.create(user=kwargs['instance'])
\ No newline at end of file
+        customer = Customer.objects.create(user=kwargs['instance'])
+        CustomerOrderSummary.objects.create(customer=customer)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, **kwargs):
+    product_index.update(kwargs['instance'])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, **kwargs):
+    product_index.remove(kwargs['instance'].id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=Collection)
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_cached_responses(sender, **kwargs):
+    # After commit, or a concurrent read could cache the old rows under
+    # the new generation
+    model_name = sender._meta.model_name
+    transaction.on_commit(lambda: bump_generation(model_name))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def invalidate_cached_promotions(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation('product'))
+
+
+def _add_to_products_count(collection_id, delta):
+    Collection.objects.filter(pk=collection_id)\
+        .update(products_count=F('products_count') + delta)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_collection(sender, **kwargs):
+    product = kwargs['instance']
+    product._previous_collection_id = None
+    if product.pk is not None and not product._state.adding:
+        product._previous_collection_id = Product.objects\
+            .filter(pk=product.pk)\
+            .values_list('collection_id', flat=True)\
+            .first()
+
+
+@receiver(post_save, sender=Product)
+def update_products_count_on_save(sender, **kwargs):
+    product = kwargs['instance']
+    previous = getattr(product, '_previous_collection_id', None)
+    with transaction.atomic():
+        if kwargs['created']:
+            _add_to_products_count(product.collection_id, 1)
+        elif previous is not None and previous != product.collection_id:
+            _add_to_products_count(previous, -1)
+            _add_to_products_count(product.collection_id, 1)
+
+
+@receiver(post_delete, sender=Product)
+def update_products_count_on_delete(sender, **kwargs):
+    _add_to_products_count(kwargs['instance'].collection_id, -1)
+
+
+@receiver(post_save, sender=Order)
+def update_order_summary_on_save(sender, **kwargs):
+    # Payment status changes go through store.payments, which sends
+    # payment_status_changed from the transaction holding the order locks
+    if kwargs['created']:
+        record_order_placed(kwargs['instance'])
+
+
+@receiver(payment_status_changed)
+def update_order_summaries_on_payment(sender, **kwargs):
+    record_payment_status_changes(kwargs['changes'])
+
+
+@receiver(payment_status_changed)
+def update_sales_rollups_on_payment(sender, **kwargs):
+    record_sales(kwargs['changes'])
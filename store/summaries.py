@@ -0,0 +1,157 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from .models import ArchivedOrder, ArchivedOrderItem, Customer, CustomerOrderSummary, \
+    Order, OrderItem
+
+
+TOP_PRODUCTS = 5
+
+
+def top_products(summary, limit=TOP_PRODUCTS):
+    ranked = sorted(
+        summary.products.items(), key=lambda item: (-item[1][1], int(item[0])))
+    return [
+        {'id': int(product_id), 'title': title, 'quantity': quantity}
+        for product_id, (title, quantity) in ranked[:limit]
+    ]
+
+
+def record_order_placed(order):
+    """
+    Counts a new order in its customer's summary, a single UPDATE as the
+    summary row is created along with the customer.
+    """
+    values = {'order_count': F('order_count') + 1, 'last_order_at': order.placed_at}
+    summaries = CustomerOrderSummary.objects.filter(customer_id=order.customer_id)
+    if summaries.update(**values):
+        return
+    _, created = CustomerOrderSummary.objects.get_or_create(
+        customer_id=order.customer_id,
+        defaults={'order_count': 1, 'last_order_at': order.placed_at})
+    if not created:
+        summaries.update(**values)
+
+
+def record_payment_status_changes(changes):
+    """
+    Adds to (or takes back from) the summaries the items of orders whose
+    payment became (or stopped being) complete.
+
+    `changes` are (order_id, customer_id, previous_status, new_status)
+    tuples, applied with one query for the items and one locked read and
+    one bulk update for the summaries.
+    """
+    complete = Order.PAYMENT_STATUS_COMPLETE
+    signs = {
+        order_id: 1 if new == complete else -1
+        for order_id, _, previous, new in changes
+        if (previous == complete) != (new == complete)
+    }
+    if not signs:
+        return
+
+    deltas = defaultdict(lambda: {'spend': Decimal(0), 'products': defaultdict(int), 'titles': {}})
+    items = OrderItem.objects\
+        .filter(order_id__in=signs)\
+        .values_list('order_id', 'order__customer_id', 'product_id', 'product__title',
+                     'quantity', 'unit_price')
+    for order_id, customer_id, product_id, title, quantity, unit_price in items:
+        delta = deltas[customer_id]
+        delta['spend'] += signs[order_id] * quantity * unit_price
+        delta['products'][product_id] += signs[order_id] * quantity
+        delta['titles'][product_id] = title
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Locked in customer order, like inventory, to avoid deadlocks
+        summaries = {
+            summary.customer_id: summary for summary in CustomerOrderSummary.objects
+            .select_for_update()
+            .filter(customer_id__in=deltas)
+            .order_by('customer_id')
+        }
+        missing = [
+            CustomerOrderSummary(customer_id=customer_id)
+            for customer_id in deltas if customer_id not in summaries
+        ]
+        CustomerOrderSummary.objects.bulk_create(missing, ignore_conflicts=True)
+        if missing:
+            summaries.update({
+                summary.customer_id: summary for summary in CustomerOrderSummary.objects
+                .select_for_update()
+                .filter(customer_id__in=[summary.customer_id for summary in missing])
+            })
+
+        for customer_id, delta in deltas.items():
+            summary = summaries[customer_id]
+            summary.lifetime_spend += delta['spend']
+            for product_id, quantity in delta['products'].items():
+                key = str(product_id)
+                _, current = summary.products.get(key, (None, 0))
+                if current + quantity > 0:
+                    summary.products[key] = [delta['titles'][product_id], current + quantity]
+                else:
+                    summary.products.pop(key, None)
+        CustomerOrderSummary.objects.bulk_update(
+            summaries.values(), ['lifetime_spend', 'products'])
+
+
+def rebuild_order_summaries(batch_size=500):
+    """
+    Recomputes every summary from the order and archive tables,
+    `batch_size` customers per transaction, and returns the number of
+    summaries written.
+    """
+    written = 0
+    last_id = 0
+    while True:
+        customer_ids = list(
+            Customer.objects
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not customer_ids:
+            break
+        last_id = customer_ids[-1]
+
+        summaries = {
+            customer_id: CustomerOrderSummary(customer_id=customer_id, products={})
+            for customer_id in customer_ids
+        }
+        # Archived orders still count, they are read the same way
+        for orders, order_items in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+            placed = orders.objects\
+                .filter(customer_id__in=customer_ids)\
+                .order_by()\
+                .values('customer_id')\
+                .annotate(count=Count('id'), last_order_at=Max('placed_at'))\
+                .values_list('customer_id', 'count', 'last_order_at')
+            for customer_id, count, last_order_at in placed:
+                summary = summaries[customer_id]
+                summary.order_count += count
+                if summary.last_order_at is None or last_order_at > summary.last_order_at:
+                    summary.last_order_at = last_order_at
+            paid = order_items.objects\
+                .filter(order__customer_id__in=customer_ids,
+                        order__payment_status=Order.PAYMENT_STATUS_COMPLETE)\
+                .order_by()\
+                .values('order__customer_id', 'product_id', 'product__title')\
+                .annotate(units=Sum('quantity'), spend=Sum(F('quantity') * F('unit_price')))\
+                .values_list('order__customer_id', 'product_id', 'product__title', 'units', 'spend')
+            for customer_id, product_id, title, quantity, spend in paid:
+                summary = summaries[customer_id]
+                summary.lifetime_spend += spend
+                _, current = summary.products.get(str(product_id), (None, 0))
+                summary.products[str(product_id)] = [title, current + quantity]
+
+        with transaction.atomic():
+            CustomerOrderSummary.objects.filter(customer_id__in=customer_ids).delete()
+            CustomerOrderSummary.objects.bulk_create(summaries.values())
+        written += len(summaries)
+    return written
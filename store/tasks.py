@@ -0,0 +1,29 @@
+from celery import shared_task
+
+from .carts import get_cart_store, reap_abandoned_carts
+from . import archive, events, idempotency
+
+
+@shared_task
+def flush_carts():
+    get_cart_store().flush()
+
+
+@shared_task
+def reap_carts():
+    return reap_abandoned_carts()
+
+
+@shared_task
+def dispatch_order_events(event_ids=None):
+    return events.dispatch_order_events(event_ids=event_ids)
+
+
+@shared_task
+def archive_orders():
+    return archive.archive_orders()
+
+
+@shared_task
+def prune_idempotency_keys():
+    return idempotency.prune_idempotency_keys()
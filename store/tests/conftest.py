@@ -1,6 +1,11 @@
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from rest_framework.test import APIClient
+from silk.collector import DataCollector
 import pytest
+from model_bakery import baker
 
 
 @pytest.fixture
@@ -12,4 +17,41 @@ def api_client():
 def authenticate(api_client):
     def do_authenticate(is_staff=False):
         return api_client.force_authenticate(user=User(is_staff=is_staff))
-    return do_authenticate
\ No newline at end of file
+    return do_authenticate
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_order_events(settings):
+    # No broker in tests, order_created receivers run after checkout commits
+    settings.STORE_ORDER_EVENT_DISPATCH = 'eager'
+
+
+@pytest.fixture
+def without_silk(settings):
+    # silk records every request (and EXPLAINs every query of it) in the
+    # database, which would show up in query counts.
+    settings.MIDDLEWARE = [
+        middleware for middleware in settings.MIDDLEWARE
+        if not middleware.startswith('silk.')
+    ]
+    DataCollector().clear()
+
+
+@pytest.fixture
+def customer():
+    # Customers are created by the user post_save handler.
+    return baker.make(get_user_model()).customer
+
+
+@pytest.fixture
+def concurrent_transactions():
+    # Threaded tests need transactions that wait for each other's locks
+    if connection.vendor == 'sqlite' and (
+            connection.is_in_memory_db()
+            or connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE'):
+        pytest.skip('Concurrent SQLite transactions need a file database in IMMEDIATE mode')
@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from store.models import Collection, Product
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    def test_if_same_request_is_repeated_returns_cached_response(self, api_client):
+        baker.make(Product)
+
+        first = api_client.get('/store/products/')
+        second = api_client.get('/store/products/')
+
+        assert first['X-Cache'] == 'MISS'
+        assert second['X-Cache'] == 'HIT'
+        assert second.data == first.data
+
+    def test_if_query_params_differ_returns_miss(self, api_client):
+        baker.make(Product)
+        api_client.get('/store/products/?ordering=price')
+
+        response = api_client.get('/store/products/?ordering=-price')
+
+        assert response['X-Cache'] == 'MISS'
+
+    def test_if_product_changes_returns_fresh_price(
+            self, api_client, django_capture_on_commit_callbacks):
+        product = baker.make(Product, price=Decimal(10))
+        api_client.get(f'/store/products/{product.id}/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.price = Decimal(20)
+            product.save()
+        response = api_client.get(f'/store/products/{product.id}/')
+
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['price'] == Decimal(20)
+
+    def test_if_product_is_added_collection_count_is_fresh(
+            self, api_client, django_capture_on_commit_callbacks):
+        collection = baker.make(Collection)
+        api_client.get('/store/collections/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=collection)
+        response = api_client.get('/store/collections/')
+
+        assert response.data[0]['products_count'] == 1
+
+    def test_if_user_is_authenticated_response_is_not_cached(self, api_client, authenticate):
+        authenticate()
+
+        response = api_client.get('/store/products/')
+
+        assert 'X-Cache' not in response
+
+    def test_cache_is_invalidated_only_once_the_change_commits(
+            self, api_client, django_capture_on_commit_callbacks):
+        product = baker.make(Product, price=Decimal(10))
+        api_client.get(f'/store/products/{product.id}/')
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            product.price = Decimal(20)
+            product.save()
+
+        assert api_client.get(f'/store/products/{product.id}/')['X-Cache'] == 'HIT'
+        for callback in callbacks:
+            callback()
+        assert api_client.get(f'/store/products/{product.id}/')['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db
+class TestResponseCacheStats:
+    def test_if_user_is_not_admin_returns_403(self, api_client, authenticate):
+        authenticate()
+
+        response = api_client.get('/store/cache-stats/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_user_is_admin_returns_counters(self, api_client, authenticate):
+        api_client.get('/store/products/')
+        api_client.get('/store/products/')
+        authenticate(is_staff=True)
+
+        response = api_client.get('/store/cache-stats/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'hits': 1, 'misses': 1}
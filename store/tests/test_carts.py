@@ -0,0 +1,346 @@
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from time import sleep
+from uuid import uuid4
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from store.carts import CacheCartStore, get_cart_store, reap_abandoned_carts
+from store.identifiers import uuid7
+from store.models import Cart, CartItem, Product
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture(params=['store.carts.DatabaseCartStore', 'store.carts.CacheCartStore'])
+def cart_backend(request, settings, monkeypatch):
+    settings.STORE_CART_BACKEND = request.param
+    # The test cache is a local memory one, which never fills up here
+    monkeypatch.setattr(CacheCartStore, 'evicting_backends', ())
+    return request.param
+
+
+@pytest.fixture
+def cache_cart_backend(settings, monkeypatch):
+    settings.STORE_CART_BACKEND = 'store.carts.CacheCartStore'
+    monkeypatch.setattr(CacheCartStore, 'evicting_backends', ())
+
+
+@pytest.mark.django_db
+class TestCartStores:
+    def test_cart_lifecycle(self, api_client, cart_backend):
+        product = baker.make(Product, price=Decimal(2))
+        cart_id = api_client.post('/store/carts/').data['id']
+
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 1})
+        response = api_client.post(
+            f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 2})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['quantity'] == 3
+        item_id = response.data['id']
+
+        response = api_client.patch(f'/store/carts/{cart_id}/items/{item_id}/', {'quantity': 5})
+
+        assert response.data == {'quantity': 5}
+        response = api_client.get(f'/store/carts/{cart_id}/')
+        assert response.data['items'][0]['quantity'] == 5
+        assert response.data['total_price'] == Decimal(10)
+
+        response = api_client.delete(f'/store/carts/{cart_id}/items/{item_id}/')
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert api_client.get(f'/store/carts/{cart_id}/items/').data == []
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client, cart_backend):
+        response = api_client.get('/store/carts/00000000-0000-0000-0000-000000000000/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_product_does_not_exist_returns_400(self, api_client, cart_backend):
+        cart_id = api_client.post('/store/carts/').data['id']
+
+        response = api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': 0, 'quantity': 1})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['product_id'] == ['No product with the given ID was found.']
+
+    def test_if_cart_is_deleted_returns_404(self, api_client, cart_backend):
+        cart_id = api_client.post('/store/carts/').data['id']
+
+        api_client.delete(f'/store/carts/{cart_id}/')
+
+        assert api_client.get(f'/store/carts/{cart_id}/').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestCartTotals:
+    def test_totals_are_computed_in_the_database(
+            self, api_client, without_silk, django_assert_num_queries):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product__price=Decimal('1.25'), quantity=3)
+        baker.make(CartItem, cart=cart, product__price=Decimal('0.10'), quantity=2)
+
+        # the cart with its total, then the items joined to their products
+        with django_assert_num_queries(2) as context:
+            response = api_client.get(f'/store/carts/{cart.id}/')
+
+        assert response.data['total_price'] == Decimal('3.95')
+        assert sorted(item['total_price'] for item in response.data['items']) == \
+            [Decimal('0.20'), Decimal('3.75')]
+        assert 'description' not in context.captured_queries[1]['sql']
+
+    def test_if_only_the_total_is_requested_items_are_not_loaded(
+            self, api_client, without_silk, django_assert_num_queries):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product__price=Decimal(2), quantity=2)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(f'/store/carts/{cart.id}/?fields=total_price')
+
+        assert response.data == {'total_price': Decimal(4)}
+
+    def test_if_cart_is_empty_total_is_zero(self, api_client, cart_backend):
+        cart_id = api_client.post('/store/carts/').data['id']
+
+        response = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert response.data['total_price'] == 0
+
+
+@pytest.mark.django_db
+class TestBatchCartItems:
+    def test_operations_are_applied_in_order(self, api_client, cart_backend):
+        products = baker.make(Product, price=Decimal(1), _quantity=3)
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': products[0].id, 'quantity': 1})
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': products[1].id, 'quantity': 1})
+
+        response = api_client.post(f'/store/carts/{cart_id}/items/batch/', [
+            {'product_id': products[0].id, 'quantity': 2},
+            {'op': 'remove', 'product_id': products[1].id},
+            {'op': 'add', 'product_id': products[2].id, 'quantity': 1},
+            {'op': 'update', 'product_id': products[2].id, 'quantity': 4},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {
+            item['product']['id']: item['quantity'] for item in response.data['items']
+        } == {products[0].id: 3, products[2].id: 4}
+        assert response.data['total_price'] == Decimal(7)
+
+    def test_if_a_product_does_not_exist_nothing_is_applied(self, api_client, cart_backend):
+        product = baker.make(Product)
+        cart_id = api_client.post('/store/carts/').data['id']
+
+        response = api_client.post(f'/store/carts/{cart_id}/items/batch/', [
+            {'product_id': product.id, 'quantity': 1},
+            {'product_id': 0, 'quantity': 1},
+        ], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['product_id'] == ['No product with the given ID was found: 0.']
+        assert api_client.get(f'/store/carts/{cart_id}/items/').data == []
+
+    def test_if_quantity_is_missing_returns_400(self, api_client):
+        product = baker.make(Product)
+        cart = baker.make(Cart)
+
+        response = api_client.post(
+            f'/store/carts/{cart.id}/items/batch/', [{'product_id': product.id}], format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_writes_are_batched(self, api_client, without_silk, django_assert_max_num_queries):
+        cart = baker.make(Cart)
+        products = baker.make(Product, _quantity=20)
+        baker.make(CartItem, cart=cart, product=products[0], quantity=1)
+
+        # product check, savepoint, cart and item locks, bulk_create,
+        # bulk_update, release, then reading the cart back
+        with django_assert_max_num_queries(10):
+            response = api_client.post(f'/store/carts/{cart.id}/items/batch/', [
+                {'product_id': product.id, 'quantity': 1} for product in products
+            ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert CartItem.objects.filter(cart=cart).count() == 20
+
+
+@pytest.mark.django_db
+class TestAddCartItem:
+    def test_add_is_a_single_upsert(self, api_client, without_silk, django_assert_num_queries):
+        cart = baker.make(Cart)
+        product = baker.make(Product)
+        baker.make(CartItem, cart=cart, product=product, quantity=1)
+
+        # the upsert, then touching the cart's updated_at
+        with django_assert_num_queries(2):
+            response = api_client.post(
+                f'/store/carts/{cart.id}/items/', {'product_id': product.id, 'quantity': 2})
+
+        assert response.data == {'id': CartItem.objects.get().id, 'product_id': product.id, 'quantity': 3}
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client):
+        product = baker.make(Product)
+
+        response = api_client.post(
+            '/store/carts/00000000-0000-0000-0000-000000000000/items/',
+            {'product_id': product.id, 'quantity': 1})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentAddCartItem:
+    def test_parallel_adds_are_all_counted(self, without_silk, cart_backend):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            pytest.skip('In-memory SQLite does not support concurrent writers')
+        cart = baker.make(Cart)
+        product = baker.make(Product)
+
+        def add(_):
+            try:
+                return APIClient().post(
+                    f'/store/carts/{cart.id}/items/',
+                    {'product_id': product.id, 'quantity': 1}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(add, range(40)))
+
+        assert statuses == [status.HTTP_201_CREATED] * 40
+        get_cart_store().flush(cart.id)
+        assert CartItem.objects.get(cart=cart, product=product).quantity == 40
+
+
+@pytest.mark.django_db
+class TestCacheCartStore:
+    def test_refuses_a_cache_that_evicts_entries(self):
+        with pytest.raises(ImproperlyConfigured):
+            CacheCartStore()
+
+    def test_changes_are_written_on_flush(self, api_client, cache_cart_backend):
+        product = baker.make(Product)
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 2})
+
+        assert not Cart.objects.filter(pk=cart_id).exists()
+
+        call_command('flush_carts', stdout=StringIO())
+
+        assert CartItem.objects.get(cart_id=cart_id).quantity == 2
+
+    def test_removed_items_are_deleted_on_flush(self, api_client, cache_cart_backend):
+        cart = baker.make(Cart)
+        item = baker.make(CartItem, cart=cart, quantity=1)
+
+        response = api_client.delete(f'/store/carts/{cart.id}/items/{item.id}/')
+        call_command('flush_carts', stdout=StringIO())
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not CartItem.objects.filter(cart=cart).exists()
+
+    def test_item_ids_stay_the_same_when_the_backend_changes(
+            self, api_client, cache_cart_backend, settings):
+        product = baker.make(Product)
+        cart_id = api_client.post('/store/carts/').data['id']
+        item_id = api_client.post(
+            f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 2}).data['id']
+        call_command('flush_carts', stdout=StringIO())
+        settings.STORE_CART_BACKEND = 'store.carts.DatabaseCartStore'
+
+        response = api_client.get(f'/store/carts/{cart_id}/items/{item_id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['product']['id'] == product.id
+
+    def test_checkout_flushes_the_cart(self, api_client, customer, cache_cart_backend):
+        api_client.force_authenticate(user=customer.user)
+        product = baker.make(Product, inventory=5)
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 2})
+
+        response = api_client.post('/store/orders/', {'cart_id': cart_id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['items'][0]['quantity'] == 2
+        assert api_client.get(f'/store/carts/{cart_id}/').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestReapAbandonedCarts:
+    def test_deletes_only_idle_carts_in_batches(self):
+        idle = baker.make(Cart, _quantity=5)
+        baker.make(CartItem, cart=idle[0], quantity=1)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        active = baker.make(Cart)
+
+        reaped = reap_abandoned_carts(ttl=60 * 60 * 24, batch_size=2)
+
+        assert reaped == {'carts': 5, 'items': 1}
+        assert list(Cart.objects.all()) == [active]
+
+    def test_changing_items_keeps_the_cart(self, api_client, cart_backend):
+        cart = baker.make(Cart)
+        product = baker.make(Product)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        api_client.post(f'/store/carts/{cart.id}/items/', {'product_id': product.id, 'quantity': 1})
+        reap_abandoned_carts(ttl=60 * 60 * 24)
+
+        assert Cart.objects.filter(pk=cart.id).exists()
+
+    def test_carts_changed_in_the_cache_are_not_idle(self, cache_cart_backend):
+        store = get_cart_store()
+        carts = baker.make(Cart, _quantity=2)
+        store.add_item(carts[0].id, baker.make(Product).id, 1)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        assert store.changed_since([cart.id for cart in carts], timezone.now() - timedelta(days=1)) \
+            == {carts[0].id}
+
+    def test_command_reports_deleted_rows(self):
+        baker.make(Cart)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        stdout = StringIO()
+
+        call_command('reap_carts', '--ttl', '3600', stdout=stdout)
+
+        assert '1 cart(s) and 0 cart item(s) deleted.' in stdout.getvalue()
+
+
+class TestCartIds:
+    def test_uuid7_ids_are_time_ordered(self):
+        first = uuid7()
+        sleep(0.002)
+        second = uuid7()
+
+        assert first.version == second.version == 7
+        assert first < second
+
+    @pytest.mark.django_db
+    def test_existing_uuid4_carts_are_still_found(self, api_client):
+        cart = baker.make(Cart, id=uuid4())
+
+        response = api_client.get(f'/store/carts/{cart.id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+
+    # MySQL commits implicitly around the scratch tables' DDL
+    @pytest.mark.django_db(transaction=True)
+    def test_benchmark_command_reports_both_generators(self):
+        stdout = StringIO()
+
+        call_command('benchmark_cart_ids', '--rows', '100', '--batch-size', '30', stdout=stdout)
+
+        assert 'uuid4:' in stdout.getvalue()
+        assert 'uuid7:' in stdout.getvalue()
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from store.models import Collection, Product
 from rest_framework import status
 import pytest
@@ -55,3 +58,44 @@ class TestRetrieveCollection:
             'title': collection.title,
             'products_count': 0
         } 
+
+
+@pytest.mark.django_db
+class TestCollectionProductsCount:
+    def test_if_product_is_created_count_is_incremented(self):
+        collection = baker.make(Collection)
+
+        baker.make(Product, collection=collection, _quantity=2)
+
+        collection.refresh_from_db()
+        assert collection.products_count == 2
+
+    def test_if_product_moves_count_follows(self):
+        old, new = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=old)
+
+        product.collection = new
+        product.save()
+
+        old.refresh_from_db()
+        new.refresh_from_db()
+        assert (old.products_count, new.products_count) == (0, 1)
+
+    def test_if_product_is_deleted_count_is_decremented(self):
+        collection = baker.make(Collection)
+        product = baker.make(Product, collection=collection)
+
+        product.delete()
+
+        collection.refresh_from_db()
+        assert collection.products_count == 0
+
+    def test_recount_command_fixes_drift(self):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=3)
+        Collection.objects.update(products_count=7)
+
+        call_command('recount_collection_products', stdout=StringIO())
+
+        collection.refresh_from_db()
+        assert collection.products_count == 3
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from store.idempotency import prune_idempotency_keys
+from store.models import Cart, CartItem, IdempotencyKey, Order, Product
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def cart():
+    cart = baker.make(Cart)
+    baker.make(CartItem, cart=cart, product=baker.make(Product, inventory=5), quantity=2)
+    return cart
+
+
+@pytest.fixture
+def post_order(api_client, customer):
+    api_client.force_authenticate(user=customer.user)
+
+    def do_post_order(cart_id, key):
+        return api_client.post(
+            '/store/orders/', {'cart_id': cart_id}, format='json', headers={'Idempotency-Key': key})
+    return do_post_order
+
+
+@pytest.mark.django_db
+class TestOrderIdempotency:
+    def test_retry_replays_the_original_response(
+            self, post_order, cart, without_silk, django_assert_max_num_queries,
+            django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            first = post_order(cart.id, 'abc')
+
+        # the cache answers, neither the cart nor the order tables are read
+        with django_assert_max_num_queries(0):
+            retry = post_order(cart.id, 'abc')
+
+        assert first.status_code == retry.status_code == status.HTTP_200_OK
+        assert retry.json() == first.json()
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert Order.objects.count() == 1
+
+    def test_if_cache_is_cold_replays_from_the_table(self, post_order, cart):
+        first = post_order(cart.id, 'abc')
+        cache.clear()
+
+        retry = post_order(cart.id, 'abc')
+
+        assert retry.json() == first.json()
+        assert Order.objects.count() == 1
+
+    def test_if_key_is_reused_for_another_request_returns_422(self, post_order, cart):
+        post_order(cart.id, 'abc')
+
+        response = post_order(baker.make(Cart).id, 'abc')
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_keys_are_scoped_to_the_user(self, api_client, post_order, cart):
+        post_order(cart.id, 'abc')
+        other = baker.make(Cart)
+        baker.make(CartItem, cart=other, product=baker.make(Product, inventory=5), quantity=1)
+        api_client.force_authenticate(user=baker.make('core.User'))
+
+        response = api_client.post(
+            '/store/orders/', {'cart_id': other.id}, format='json', headers={'Idempotency-Key': 'abc'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert IdempotencyKey.objects.count() == 2
+
+    def test_if_checkout_fails_the_key_is_not_stored(self, post_order):
+        response = post_order(baker.make(Cart).id, 'abc')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not IdempotencyKey.objects.exists()
+
+
+@pytest.mark.django_db
+class TestPruneIdempotencyKeys:
+    def test_deletes_only_expired_responses(self, customer, settings):
+        settings.STORE_IDEMPOTENCY_KEY_TIMEOUT = 60
+        orders = baker.make(Order, customer=customer, _quantity=3)
+        keys = [
+            IdempotencyKey.objects.create(
+                user=customer.user, key=str(order.id), request_hash='', order=order, response={})
+            for order in orders
+        ]
+        IdempotencyKey.objects.filter(pk__in=[keys[0].pk, keys[1].pk])\
+            .update(created_at=timezone.now() - timedelta(minutes=2))
+
+        assert prune_idempotency_keys(batch_size=1) == 2
+        assert list(IdempotencyKey.objects.values_list('id', flat=True)) == [keys[2].id]
+
+    def test_command_reports_rows_deleted(self, customer):
+        order = baker.make(Order, customer=customer)
+        IdempotencyKey.objects.create(
+            user=customer.user, key='k', request_hash='', order=order, response={})
+        stdout = StringIO()
+
+        call_command('prune_idempotency_keys', '--ttl', '0', stdout=stdout)
+
+        assert '1 idempotency key(s) deleted.' in stdout.getvalue()
+        assert not IdempotencyKey.objects.exists()
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from store.models import Cart, CartItem, Order, Product
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def checkout(api_client, customer):
+    def do_checkout(*lines):
+        cart = baker.make(Cart)
+        for product, quantity in lines:
+            baker.make(CartItem, cart=cart, product=product, quantity=quantity)
+        api_client.force_authenticate(user=customer.user)
+        return cart, api_client.post('/store/orders/', {'cart_id': cart.id})
+    return do_checkout
+
+
+@pytest.mark.django_db
+class TestCheckoutInventory:
+    def test_stock_is_taken_for_every_line(self, checkout):
+        products = baker.make(Product, inventory=5, _quantity=2)
+
+        _, response = checkout((products[0], 2), (products[1], 5))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(Product.objects.order_by('id').values_list('inventory', flat=True)) == [3, 0]
+
+    def test_if_a_line_falls_short_nothing_is_taken(self, checkout):
+        products = baker.make(Product, inventory=5, _quantity=2)
+
+        cart, response = checkout((products[0], 2), (products[1], 6))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['cart_id'] == [f'Not enough stock for product {products[1].id}: 5 left.']
+        assert list(Product.objects.values_list('inventory', flat=True)) == [5, 5]
+        assert not Order.objects.exists()
+        assert Cart.objects.filter(pk=cart.id).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentCheckout:
+    def test_stock_is_never_oversold(self, without_silk, concurrent_transactions):
+        products = baker.make(Product, inventory=10, _quantity=3)
+        checkouts = []
+        for index in range(24):
+            user = baker.make(get_user_model())
+            cart = baker.make(Cart)
+            # Every cart holds two of the products, in varying order
+            for product in (products[index % 3], products[(index + 1) % 3]):
+                baker.make(CartItem, cart=cart, product=product, quantity=1)
+            checkouts.append((user, cart))
+
+        def place_order(checkout):
+            user, cart = checkout
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                return client.post('/store/orders/', {'cart_id': cart.id}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(place_order, checkouts))
+
+        placed = statuses.count(status.HTTP_200_OK)
+        assert placed + statuses.count(status.HTTP_400_BAD_REQUEST) == len(checkouts)
+        inventories = list(Product.objects.values_list('inventory', flat=True))
+        assert min(inventories) >= 0
+        # Each placed order took one unit of two products
+        assert sum(inventories) == 30 - 2 * placed
+        assert Order.objects.count() == placed
+
+    def test_a_cart_is_checked_out_once(self, without_silk, concurrent_transactions):
+        product = baker.make(Product, inventory=10)
+        user = baker.make(get_user_model())
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=product, quantity=3)
+
+        def place_order(_):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                return client.post('/store/orders/', {'cart_id': cart.id}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            statuses = list(executor.map(place_order, range(4)))
+
+        assert sorted(statuses) == [status.HTTP_200_OK] + [status.HTTP_400_BAD_REQUEST] * 3
+        assert Order.objects.count() == 1
+        assert Product.objects.get(pk=product.pk).inventory == 7
+
+
+@pytest.mark.django_db
+class TestCheckoutQueries:
+    @pytest.mark.parametrize('lines', [1, 20])
+    def test_checkout_stays_within_query_budget(
+            self, api_client, customer, without_silk, django_assert_max_num_queries, lines):
+        cart = baker.make(Cart)
+        for product in baker.make(Product, inventory=5, _quantity=lines):
+            baker.make(CartItem, cart=cart, product=product, quantity=1)
+        api_client.force_authenticate(user=customer.user)
+
+        # cart and lines, customer, stock lock and update, order, order
+        # summary, items, cart delete (3), event, plus the test transaction's
+        # savepoint pair; the response is rendered without further queries
+        with django_assert_max_num_queries(13):
+            response = api_client.post('/store/orders/', {'cart_id': cart.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['items']) == lines
+        assert all(item['id'] and item['product']['title'] for item in response.data['items'])
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.utils import timezone
+
+from store.archive import archive_orders
+from store.models import ArchivedOrder, ArchivedOrderItem, CustomerOrderSummary, \
+    DailyProductSales, Order, OrderEvent, OrderItem, Product
+from store.rollups import backfill_sales
+from store.summaries import rebuild_order_summaries
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def make_order(customer):
+    def do_make_order(days_ago, payment_status=Order.PAYMENT_STATUS_COMPLETE, items=2, product=None):
+        order = baker.make(Order, customer=customer, payment_status=payment_status)
+        Order.objects.filter(pk=order.pk).update(placed_at=timezone.now() - timedelta(days=days_ago))
+        for _ in range(items):
+            baker.make(OrderItem, order=order, product=product or baker.make(Product),
+                       quantity=2, unit_price=Decimal('1.50'))
+        order.refresh_from_db()
+        return order
+    return do_make_order
+
+
+@pytest.mark.django_db
+class TestArchiveOrders:
+    def test_moves_old_completed_orders_with_their_items(self, make_order):
+        old = [make_order(400), make_order(500)]
+        recent = make_order(10)
+        pending = make_order(400, payment_status=Order.PAYMENT_STATUS_PENDING)
+        baker.make(OrderEvent, order=old[0])
+
+        moved = archive_orders(days=365, batch_size=1)
+
+        assert moved == {'orders': 2, 'items': 4}
+        assert set(Order.objects.values_list('id', flat=True)) == {recent.id, pending.id}
+        assert set(ArchivedOrder.objects.values_list('id', flat=True)) == {order.id for order in old}
+        archived = ArchivedOrder.objects.get(pk=old[0].id)
+        assert (archived.placed_at, archived.customer_id) == (old[0].placed_at, old[0].customer_id)
+        assert ArchivedOrderItem.objects.filter(order=archived).count() == 2
+        assert not OrderEvent.objects.exists()
+
+    def test_nothing_to_archive(self, make_order):
+        make_order(10)
+
+        assert archive_orders(days=365) == {'orders': 0, 'items': 0}
+
+    def test_command_reports_rows_moved(self, make_order):
+        make_order(400, items=3)
+        out = StringIO()
+
+        call_command('archive_orders', '--days=365', '--batch-size=10', stdout=out)
+
+        assert '1 order(s) and 3 order item(s) archived.' in out.getvalue()
+
+    def test_rebuilds_keep_counting_archived_orders(self, customer, make_order):
+        product = baker.make(Product)
+        make_order(400, items=1, product=product)
+        make_order(10, items=1, product=product)
+        archive_orders(days=365)
+
+        rebuild_order_summaries()
+        backfill_sales()
+
+        summary = CustomerOrderSummary.objects.get(customer=customer)
+        assert summary.order_count == 2
+        assert summary.lifetime_spend == Decimal(6)
+        assert summary.products == {str(product.id): [product.title, 4]}
+        assert sum(DailyProductSales.objects.filter(product=product).values_list('units', flat=True)) == 4
+
+
+@pytest.mark.django_db
+class TestArchivedOrdersApi:
+    def test_archived_orders_are_listed_on_request(self, api_client, customer, make_order):
+        archived = make_order(400)
+        live = make_order(10)
+        archive_orders(days=365)
+        api_client.force_authenticate(user=customer.user)
+
+        default = api_client.get('/store/orders/')
+        response = api_client.get('/store/orders/?archived=true')
+
+        assert [order['id'] for order in default.data['results']] == [live.id]
+        assert [order['id'] for order in response.data['results']] == [archived.id]
+        assert len(response.data['results'][0]['items']) == 2
+
+    def test_archived_order_is_retrieved_by_id(self, api_client, customer, make_order):
+        order = make_order(400)
+        archive_orders(days=365)
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.get(f'/store/orders/{order.id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['payment_status'] == Order.PAYMENT_STATUS_COMPLETE
+        assert len(response.data['items']) == 2
+
+    def test_archived_order_cannot_be_updated(self, api_client, authenticate, make_order):
+        order = make_order(400)
+        archive_orders(days=365)
+        authenticate(is_staff=True)
+
+        response = api_client.patch(f'/store/orders/{order.id}/', {'payment_status': 'F'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_history_reads_archived_orders_on_request(self, api_client, customer, make_order):
+        order = make_order(400)
+        archive_orders(days=365)
+        user = baker.make('core.User')
+        user.user_permissions.add(Permission.objects.get(codename='view_history'))
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(f'/store/customers/{customer.id}/history/?archived=true')
+
+        assert [order['id'] for order in response.data['results']] == [order.id]
+        assert response.data['summary']['order_count'] == 1
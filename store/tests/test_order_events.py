@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from store.events import MAX_ATTEMPTS, dispatch_order_events
+from store.models import Cart, CartItem, Order, OrderEvent, Product
+from store.signals import order_created
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def receiver():
+    calls = []
+
+    def on_order_created(sender, order, **kwargs):
+        if receiver.fail:
+            raise RuntimeError('receiver failed')
+        calls.append(order.id)
+
+    receiver.fail = False
+    receiver.calls = calls
+    order_created.connect(on_order_created)
+    yield receiver
+    order_created.disconnect(on_order_created)
+
+
+@pytest.fixture
+def place_order(api_client, customer):
+    def do_place_order():
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=baker.make(Product, inventory=5), quantity=1)
+        api_client.force_authenticate(user=customer.user)
+        return api_client.post('/store/orders/', {'cart_id': cart.id})
+    return do_place_order
+
+
+@pytest.mark.django_db
+class TestOrderEvents:
+    def test_receivers_run_after_commit(
+            self, place_order, receiver, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = place_order()
+
+            assert receiver.calls == []
+
+        for callback in callbacks:
+            callback()
+        assert receiver.calls == [response.data['id']]
+        assert OrderEvent.objects.get().dispatched_at is not None
+
+    def test_if_a_receiver_fails_the_event_is_retried(
+            self, place_order, receiver, django_capture_on_commit_callbacks):
+        receiver.fail = True
+        with django_capture_on_commit_callbacks(execute=True):
+            place_order()
+
+        event = OrderEvent.objects.get()
+        assert event.dispatched_at is None
+        assert event.attempts == 1
+
+        receiver.fail = False
+
+        assert dispatch_order_events() == 1
+        assert receiver.calls == [event.order_id]
+
+    def test_pending_events_are_dispatched_in_batches(self, customer, receiver):
+        orders = baker.make(Order, customer=customer, _quantity=5)
+        for order in orders:
+            OrderEvent.objects.create(order=order)
+
+        assert dispatch_order_events(batch_size=2) == 5
+        assert receiver.calls == [order.id for order in orders]
+        assert not OrderEvent.objects.filter(dispatched_at__isnull=True).exists()
+
+    def test_if_dispatch_is_celery_the_task_is_queued(
+            self, place_order, receiver, settings, monkeypatch, django_capture_on_commit_callbacks):
+        settings.STORE_ORDER_EVENT_DISPATCH = 'celery'
+        queued = []
+        monkeypatch.setattr('store.tasks.dispatch_order_events.delay', queued.append)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            place_order()
+
+        assert queued == [[OrderEvent.objects.get().id]]
+        assert receiver.calls == []
+
+    def test_if_the_broker_is_down_the_event_stays_pending(
+            self, place_order, receiver, settings, monkeypatch, django_capture_on_commit_callbacks):
+        settings.STORE_ORDER_EVENT_DISPATCH = 'celery'
+
+        def delay(event_ids):
+            raise ConnectionError('broker down')
+        monkeypatch.setattr('store.tasks.dispatch_order_events.delay', delay)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = place_order()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert OrderEvent.objects.get().dispatched_at is None
+
+    def test_checkout_dispatches_only_its_own_event(
+            self, customer, place_order, receiver, django_capture_on_commit_callbacks):
+        failed = OrderEvent.objects.create(order=baker.make(Order, customer=customer), attempts=1)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = place_order()
+
+        assert receiver.calls == [response.data['id']]
+        failed.refresh_from_db()
+        assert (failed.attempts, failed.dispatched_at) == (1, None)
+
+    def test_if_attempts_run_out_logs_and_keeps_the_event(self, customer, receiver, caplog):
+        receiver.fail = True
+        event = OrderEvent.objects.create(
+            order=baker.make(Order, customer=customer), attempts=MAX_ATTEMPTS - 1)
+
+        dispatch_order_events()
+        dispatch_order_events()
+
+        event.refresh_from_db()
+        assert (event.attempts, event.dispatched_at) == (MAX_ATTEMPTS, None)
+        assert [record.levelname for record in caplog.records].count('CRITICAL') == 1
+
+    def test_failed_events_are_replayed(self, customer, receiver):
+        failed = OrderEvent.objects.create(
+            order=baker.make(Order, customer=customer), attempts=MAX_ATTEMPTS)
+        out = StringIO()
+
+        call_command('replay_order_events', stdout=out)
+
+        assert receiver.calls == [failed.order_id]
+        assert '1 order event(s) delivered.' in out.getvalue()
+        failed.refresh_from_db()
+        assert failed.dispatched_at is not None
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+
+from store.models import Customer, CustomerOrderSummary, Order, OrderItem, Product
+from store.payments import update_payment_statuses
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def order_with_items(customer):
+    def do_order_with_items(*lines):
+        order = baker.make(Order, customer=customer)
+        for product, quantity, unit_price in lines:
+            baker.make(OrderItem, order=order, product=product, quantity=quantity, unit_price=unit_price)
+        return order
+    return do_order_with_items
+
+
+def set_payment_status(order, payment_status):
+    update_payment_statuses({order.id: payment_status})
+
+
+@pytest.mark.django_db
+class TestCustomerOrderSummary:
+    def test_orders_are_counted_when_placed(self, customer, order_with_items):
+        order = order_with_items()
+
+        summary = CustomerOrderSummary.objects.get(customer=customer)
+        assert summary.order_count == 1
+        assert summary.last_order_at == order.placed_at
+        assert summary.lifetime_spend == 0
+
+    def test_spend_follows_completed_payments(self, customer, order_with_items):
+        mug, cup = baker.make(Product, title='Mug'), baker.make(Product, title='Cup')
+        order = order_with_items((mug, 2, Decimal('1.50')), (cup, 1, Decimal(4)))
+
+        set_payment_status(order, Order.PAYMENT_STATUS_COMPLETE)
+        summary = CustomerOrderSummary.objects.get(customer=customer)
+
+        assert summary.lifetime_spend == Decimal(7)
+        assert summary.products == {str(mug.id): ['Mug', 2], str(cup.id): ['Cup', 1]}
+
+        set_payment_status(order, Order.PAYMENT_STATUS_FAILED)
+        summary.refresh_from_db()
+
+        assert summary.lifetime_spend == 0
+        assert summary.products == {}
+
+    def test_rebuild_matches_incremental_updates(self, customer, order_with_items):
+        product = baker.make(Product)
+        paid = order_with_items((product, 3, Decimal(2)))
+        order_with_items((product, 1, Decimal(2)))
+        set_payment_status(paid, Order.PAYMENT_STATUS_COMPLETE)
+        expected = CustomerOrderSummary.objects.values().get(customer=customer)
+        CustomerOrderSummary.objects.all().delete()
+        stdout = StringIO()
+
+        call_command('rebuild_order_summaries', '--batch-size', '1', stdout=stdout)
+
+        assert CustomerOrderSummary.objects.values().get(customer=customer) == expected
+        assert f'{Customer.objects.count()} customer summary(ies) rebuilt.' in stdout.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentPaymentStatus:
+    def test_concurrent_updates_count_a_payment_once(
+            self, customer, order_with_items, without_silk, concurrent_transactions):
+        order = order_with_items((baker.make(Product), 2, Decimal(10)))
+
+        staff = baker.make('core.User', is_staff=True)
+
+        def complete(_):
+            client = APIClient()
+            client.force_authenticate(user=staff)
+            try:
+                return client.patch(f'/store/orders/{order.id}/', {'payment_status': 'C'}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(complete, range(16)))
+
+        assert statuses == [status.HTTP_200_OK] * 16
+        assert CustomerOrderSummary.objects.get(customer=customer).lifetime_spend == Decimal(20)
+
+
+@pytest.mark.django_db
+class TestCustomerHistory:
+    @pytest.fixture
+    def history_viewer(self, api_client):
+        user = baker.make('core.User')
+        user.user_permissions.add(Permission.objects.get(codename='view_history'))
+        api_client.force_authenticate(user=user)
+
+    def test_if_user_lacks_permission_returns_403(self, api_client, customer):
+        api_client.force_authenticate(user=baker.make('core.User'))
+
+        response = api_client.get(f'/store/customers/{customer.id}/history/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_returns_summary_and_recent_orders(
+            self, api_client, history_viewer, customer, order_with_items,
+            without_silk, django_assert_num_queries):
+        product = baker.make(Product, title='Mug')
+        orders = [order_with_items((product, 1, Decimal(5))) for _ in range(12)]
+        set_payment_status(orders[0], Order.PAYMENT_STATUS_COMPLETE)
+
+        # permission check (2), customer, summary, orders page, items
+        with django_assert_num_queries(6):
+            response = api_client.get(f'/store/customers/{customer.id}/history/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['summary'] == {
+            'order_count': 12,
+            'lifetime_spend': Decimal(5),
+            'last_order_at': response.data['summary']['last_order_at'],
+            'top_products': [{'id': product.id, 'title': 'Mug', 'quantity': 1}],
+        }
+        assert [order['id'] for order in response.data['results']] == \
+            [order.id for order in reversed(orders[2:])]
+        assert response.data['next']
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from store.models import Order, OrderItem
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def make_orders(customer):
+    def do_make_orders(count, items=2, **kwargs):
+        orders = baker.make(Order, customer=customer, _quantity=count, **kwargs)
+        for order in orders:
+            baker.make(OrderItem, order=order, quantity=1, _quantity=items)
+        return orders
+    return do_make_orders
+
+
+@pytest.mark.django_db
+class TestOrderList:
+    def test_orders_are_paginated_newest_first(self, api_client, authenticate, make_orders):
+        authenticate(is_staff=True)
+        orders = make_orders(12, items=1)
+
+        first = api_client.get('/store/orders/')
+        second = api_client.get(first.data['next'])
+
+        assert first.status_code == status.HTTP_200_OK
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        assert ids == sorted((order.id for order in orders), reverse=True)
+        assert second.data['next'] is None
+
+    @pytest.mark.parametrize('count', [3, 10])
+    def test_query_count_does_not_grow_with_the_page(
+            self, api_client, authenticate, make_orders, without_silk,
+            django_assert_num_queries, count):
+        authenticate(is_staff=True)
+        make_orders(count)
+
+        # orders page, then items joined to their products
+        with django_assert_num_queries(2):
+            response = api_client.get('/store/orders/')
+
+        assert len(response.data['results']) == count
+        assert response.data['results'][0]['items'][0]['product']['title']
+
+    def test_sparse_page_does_not_reload_the_cursor_column(
+            self, api_client, authenticate, make_orders, without_silk, django_assert_num_queries):
+        authenticate(is_staff=True)
+        make_orders(12, items=1)
+
+        with django_assert_num_queries(1):
+            response = api_client.get('/store/orders/?fields=id')
+
+        assert len(response.data['results']) == 10
+        assert response.data['next']
+
+    def test_customers_only_see_their_orders(self, api_client, customer, make_orders):
+        mine = make_orders(2)
+        other = get_user_model().objects.create(username='other').customer
+        baker.make(Order, customer=other)
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.get('/store/orders/')
+
+        assert {order['id'] for order in response.data['results']} == {order.id for order in mine}
+
+    def test_filters_by_payment_status_and_date(self, api_client, authenticate, make_orders):
+        authenticate(is_staff=True)
+        complete = make_orders(2, payment_status=Order.PAYMENT_STATUS_COMPLETE)
+        make_orders(2, payment_status=Order.PAYMENT_STATUS_PENDING)
+        old = complete[0]
+        Order.objects.filter(pk=old.pk).update(placed_at=timezone.now() - timedelta(days=10))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+
+        response = api_client.get(
+            '/store/orders/', {'payment_status': 'C', 'placed_at__gte': since})
+
+        assert [order['id'] for order in response.data['results']] == [complete[1].id]
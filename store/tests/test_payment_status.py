@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+from store.models import CustomerOrderSummary, DailyProductSales, Order, OrderItem, Product
+from store.signals import payment_status_changed
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def update_statuses(api_client):
+    def do_update_statuses(updates):
+        return api_client.post('/store/orders/payment-status/', updates, format='json')
+    return do_update_statuses
+
+
+@pytest.mark.django_db
+class TestBulkPaymentStatus:
+    def test_if_user_is_not_admin_returns_403(self, authenticate, update_statuses):
+        authenticate()
+
+        response = update_statuses([])
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_status_is_invalid_returns_400(self, authenticate, update_statuses, customer):
+        authenticate(is_staff=True)
+        order = baker.make(Order, customer=customer)
+
+        response = update_statuses([{'id': order.id, 'payment_status': 'X'}])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_updates_orders_and_reports_missing_ids(
+            self, authenticate, update_statuses, customer, settings):
+        settings.STORE_PAYMENT_STATUS_BATCH_SIZE = 2
+        authenticate(is_staff=True)
+        pending = baker.make(Order, customer=customer, _quantity=3)
+        complete = baker.make(Order, customer=customer, payment_status=Order.PAYMENT_STATUS_COMPLETE)
+
+        response = update_statuses(
+            [{'id': order.id, 'payment_status': 'C'} for order in pending + [complete]]
+            + [{'id': pending[2].id, 'payment_status': 'F'}, {'id': 0, 'payment_status': 'C'}])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'updated': 3, 'unchanged': 1, 'missing': [0]}
+        assert list(Order.objects.order_by('id').values_list('payment_status', flat=True)) == \
+            ['C', 'C', 'F', 'C']
+
+    def test_hooks_fire_once_per_batch(self, authenticate, update_statuses, customer, settings):
+        settings.STORE_PAYMENT_STATUS_BATCH_SIZE = 2
+        authenticate(is_staff=True)
+        product = baker.make(Product)
+        orders = baker.make(Order, customer=customer, _quantity=3)
+        for order in orders:
+            baker.make(OrderItem, order=order, product=product, quantity=1, unit_price=Decimal(2))
+        batches = []
+
+        def on_payment_status_changed(sender, changes, **kwargs):
+            batches.append(len(changes))
+        payment_status_changed.connect(on_payment_status_changed)
+        try:
+            update_statuses([{'id': order.id, 'payment_status': 'C'} for order in orders])
+        finally:
+            payment_status_changed.disconnect(on_payment_status_changed)
+
+        assert batches == [2, 1]
+        assert CustomerOrderSummary.objects.get(customer=customer).lifetime_spend == Decimal(6)
+        assert DailyProductSales.objects.get(product=product).units == 3
+
+    def test_writes_are_batched_by_status(
+            self, authenticate, update_statuses, customer, without_silk, django_assert_max_num_queries):
+        authenticate(is_staff=True)
+        orders = baker.make(Order, customer=customer, _quantity=30)
+
+        # savepoint, locked read, one UPDATE per status, release, plus the
+        # summary and rollup hooks reading the items of the changed orders
+        with django_assert_max_num_queries(7):
+            update_statuses(
+                [{'id': order.id, 'payment_status': 'C' if order.id % 2 else 'F'} for order in orders])
+
+        assert Order.objects.filter(payment_status='P').count() == 0
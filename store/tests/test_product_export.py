@@ -0,0 +1,57 @@
+import csv
+import json
+
+from store.models import Collection, Product, ProductImage
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def catalog():
+    collection = baker.make(Collection, title='Mugs')
+    products = baker.make(Product, collection=collection, _quantity=3)
+    baker.make(ProductImage, product=products[1], image='store/images/a.jpg')
+    return products
+
+
+def read(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.mark.django_db
+class TestProductExport:
+    def test_if_user_is_not_admin_returns_403(self, api_client, authenticate):
+        authenticate()
+
+        response = api_client.get('/store/products/export/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_ndjson_streams_every_product(self, api_client, authenticate, catalog, settings):
+        settings.STORE_EXPORT_CHUNK_SIZE = 2
+        authenticate(is_staff=True)
+
+        response = api_client.get('/store/products/export/')
+
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in read(response).splitlines()]
+        assert [row['id'] for row in rows] == [product.id for product in catalog]
+        assert rows[0]['collection_title'] == 'Mugs'
+        assert rows[1]['images'] == ['http://testserver/media/store/images/a.jpg']
+
+    def test_csv_has_header_and_one_line_per_product(self, api_client, authenticate, catalog):
+        authenticate(is_staff=True)
+
+        response = api_client.get('/store/products/export/?output=csv')
+
+        rows = list(csv.DictReader(read(response).splitlines()))
+        assert len(rows) == 3
+        assert rows[1]['images'] == 'http://testserver/media/store/images/a.jpg'
+
+    def test_if_output_is_unknown_returns_400(self, api_client, authenticate):
+        authenticate(is_staff=True)
+
+        response = api_client.get('/store/products/export/?output=xml')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from store.models import Collection, Product
+from store.search import product_index
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def catalog():
+    mugs, pots = baker.make(Collection, _quantity=2)
+    for price, inventory, collection in [(5, 3, mugs), (15, 20, mugs), (60, 1, pots), (150, 50, pots)]:
+        baker.make(Product, title=f'Item {price}', price=Decimal(price),
+                   inventory=inventory, collection=collection)
+    return mugs, pots
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+    def test_if_facets_are_not_requested_they_are_not_returned(self, api_client, catalog):
+        response = api_client.get('/store/products/')
+
+        assert 'facets' not in response.data
+
+    def test_facets_count_the_filtered_set(self, api_client, catalog):
+        mugs, pots = catalog
+
+        response = api_client.get('/store/products/?facets=true&price__gt=10')
+
+        assert response.data['facets'] == {
+            'collection_id': [
+                {'value': mugs.id, 'count': 1},
+                {'value': pots.id, 'count': 2},
+            ],
+            'price': [
+                {'min': None, 'max': 10, 'count': 0},
+                {'min': 10, 'max': 50, 'count': 1},
+                {'min': 50, 'max': 100, 'count': 1},
+                {'min': 100, 'max': None, 'count': 1},
+            ],
+            'low_inventory': 1,
+        }
+
+    def test_facets_are_computed_in_one_query(
+            self, api_client, authenticate, catalog, without_silk, django_assert_num_queries):
+        authenticate()
+
+        # count, page, images, facets
+        with django_assert_num_queries(4):
+            api_client.get('/store/products/?facets=true')
+
+    def test_facets_follow_search(self, api_client, catalog):
+        product_index.clear()
+
+        response = api_client.get('/store/products/?facets=true&search=150')
+
+        assert response.data['facets']['low_inventory'] == 0
+        assert sum(f['count'] for f in response.data['facets']['collection_id']) == 1
+
+    def test_if_product_changes_facets_are_fresh(
+            self, api_client, authenticate, catalog, django_capture_on_commit_callbacks):
+        authenticate()
+        api_client.get('/store/products/?facets=true')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Product.objects.filter(inventory=50).first().delete()
+        response = api_client.get('/store/products/?facets=true')
+
+        assert response.data['facets']['price'][3]['count'] == 0
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+
+from store.models import Collection, Product
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def import_products(api_client):
+    def do_import_products(body, content_type='text/csv', query=''):
+        return api_client.post(
+            f'/store/products/import/{query}', body, content_type=content_type)
+    return do_import_products
+
+
+@pytest.mark.django_db
+class TestProductImport:
+    def test_if_user_is_not_admin_returns_403(self, authenticate, import_products):
+        authenticate()
+
+        response = import_products('title,slug\n')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_content_type_is_unknown_returns_415(self, authenticate, import_products):
+        authenticate(is_staff=True)
+
+        response = import_products('{}', content_type='application/json')
+
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    def test_if_csv_is_valid_creates_and_updates_by_slug(self, authenticate, import_products):
+        authenticate(is_staff=True)
+        collection = baker.make(Collection)
+        baker.make(Product, slug='mug', price=Decimal(1), collection=collection)
+        body = (
+            'title,slug,description,price,inventory,collection_id\n'
+            f'Mug,mug,,5.50,3,{collection.id}\n'
+            f'Cup,cup,Small,2,10,{collection.id}\n'
+            f'Pot,pot,,3,1,{collection.id}\n'
+        )
+
+        response = import_products(body, query='?batch_size=2')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'created': 2, 'updated': 1, 'rejected': 0, 'errors': []}
+        assert Product.objects.get(slug='mug').price == Decimal('5.50')
+        collection.refresh_from_db()
+        assert collection.products_count == 3
+
+    def test_if_rows_are_invalid_reports_them_and_imports_the_rest(
+            self, authenticate, import_products):
+        authenticate(is_staff=True)
+        collection = baker.make(Collection)
+        body = '\n'.join([
+            f'{{"title": "Mug", "slug": "mug", "price": "5", "inventory": 1, "collection_id": {collection.id}}}',
+            f'{{"title": "Cup", "slug": "cup", "price": "0.5", "inventory": 1, "collection_id": {collection.id}}}',
+            '{"title": "Pot", "slug": "pot", "price": "5", "inventory": 1, "collection_id": 0}',
+            'not json',
+        ])
+
+        response = import_products(body, content_type='application/x-ndjson')
+
+        assert response.data['created'] == 1
+        assert [error['row'] for error in response.data['errors']] == [2, 3, 4]
+        assert 'price' in response.data['errors'][0]['errors']
+        assert 'collection_id' in response.data['errors'][1]['errors']
+        assert list(Product.objects.values_list('slug', flat=True)) == ['mug']
+
+    def test_if_slug_repeats_in_a_batch_rejects_the_later_row(self, authenticate, import_products):
+        authenticate(is_staff=True)
+        collection = baker.make(Collection)
+        body = (
+            'title,slug,description,price,inventory,collection_id\n'
+            f'Mug,mug,,5,1,{collection.id}\n'
+            f'Big mug,mug,,9,1,{collection.id}\n'
+        )
+
+        response = import_products(body)
+
+        assert response.data['created'] == 1
+        assert response.data['errors'] == [
+            {'row': 2, 'errors': {'slug': ['Row 1 has the same slug.']}}]
+        assert Product.objects.get(slug='mug').title == 'Mug'
+
+    def test_only_the_first_errors_are_detailed(self, authenticate, import_products, settings):
+        settings.STORE_IMPORT_MAX_ERRORS = 2
+        authenticate(is_staff=True)
+        body = 'not json\n' * 5
+
+        response = import_products(body, content_type='application/x-ndjson')
+
+        assert response.data['rejected'] == 5
+        assert [error['row'] for error in response.data['errors']] == [1, 2]
+
+    def test_if_body_is_empty_returns_400(self, authenticate, import_products):
+        authenticate(is_staff=True)
+
+        response = import_products(b'')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_if_rows_are_not_utf8_reports_them(self, authenticate, import_products):
+        authenticate(is_staff=True)
+        collection = baker.make(Collection)
+        body = (
+            'title,slug,description,price,inventory,collection_id\n'
+            f'Mug,mug,,5,1,{collection.id}\n'
+        ).encode() + f'Caf\xe9,cafe,,5,1,{collection.id}\n'.encode('latin-1')
+
+        response = import_products(body)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 1
+        assert response.data['errors'] == [
+            {'row': 2, 'errors': {'__all__': ['The row is not valid UTF-8.']}}]
+
+
+@pytest.mark.django_db
+class TestImportProductsCommand:
+    def test_imports_file(self, tmp_path):
+        collection = baker.make(Collection)
+        path = tmp_path / 'products.csv'
+        path.write_text(
+            'title,slug,price,inventory,collection_id\n'
+            f'Mug,mug,5,3,{collection.id}\n')
+        stdout = StringIO()
+
+        call_command('import_products', str(path), stdout=stdout)
+
+        assert Product.objects.filter(slug='mug').exists()
+        assert '1 product(s) created' in stdout.getvalue()
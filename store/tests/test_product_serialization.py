@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from store.models import Collection, Product, ProductImage
+from store.search import product_index
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def catalog():
+    collections = baker.make(Collection, _quantity=2)
+    products = [
+        baker.make(Product, title='Mug', price=Decimal('9.99'), collection=collections[0]),
+        baker.make(Product, title='Cup', price=Decimal('1'), collection=collections[1],
+                   description=None),
+        baker.make(Product, title='Pot', price=Decimal('120.50'), collection=collections[0]),
+    ]
+    baker.make(ProductImage, product=products[0], image='store/images/mug.jpg')
+    baker.make(ProductImage, product=products[0], image='store/images/mug-2.jpg')
+    baker.make(ProductImage, product=products[2], image='store/images/pot.jpg')
+    return products
+
+
+def get_both(api_client, settings, url):
+    settings.STORE_FAST_PRODUCT_LIST = False
+    slow = api_client.get(url)
+    settings.STORE_FAST_PRODUCT_LIST = True
+    fast = api_client.get(url)
+    return slow, fast
+
+
+@pytest.mark.django_db
+class TestFastProductList:
+    @pytest.mark.parametrize('url', [
+        '/store/products/',
+        '/store/products/?page=1',
+        '/store/products/?ordering=-price',
+        '/store/products/?ordering=last_update&cursor=',
+        '/store/products/?price__gt=5',
+        '/store/products/?search=pot',
+    ])
+    def test_output_is_byte_identical(self, api_client, authenticate, settings, catalog, url):
+        # Authenticated, so that the response cache stays out of the way.
+        authenticate()
+        product_index.clear()
+
+        slow, fast = get_both(api_client, settings, url)
+
+        assert fast.status_code == slow.status_code == 200
+        assert fast.content == slow.content
+
+    def test_if_collection_filter_matches_nothing_output_is_identical(
+            self, api_client, authenticate, settings, catalog):
+        authenticate()
+
+        slow, fast = get_both(api_client, settings, '/store/products/?collection_id=0')
+
+        assert fast.content == slow.content
+
+    def test_fast_path_runs_three_queries_per_page(
+            self, api_client, authenticate, settings, catalog, without_silk,
+            django_assert_num_queries):
+        authenticate()
+        settings.STORE_FAST_PRODUCT_LIST = True
+
+        # count, page rows, images
+        with django_assert_num_queries(3):
+            api_client.get('/store/products/?page=1')
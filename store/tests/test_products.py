@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from store.models import Collection, Product
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def products():
+    collection = baker.make(Collection)
+    return [
+        baker.make(Product, collection=collection, title=title, price=Decimal(price))
+        for title, price in [('a', 5), ('b', 5), ('c', 3), ('d', 8), ('e', 5)]
+    ]
+
+
+def walk(api_client, url):
+    titles = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        titles += [product['title'] for product in response.data['results']]
+        url = response.data['next']
+    return titles
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def test_if_cursor_is_empty_returns_first_page_without_count(self, api_client, products):
+        response = api_client.get('/store/products/?cursor=')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+        assert [p['title'] for p in response.data['results']] == ['a', 'b', 'c', 'd', 'e']
+
+    def test_if_count_is_requested_returns_count(self, api_client, products):
+        response = api_client.get('/store/products/?cursor=&count=true')
+
+        assert response.data['count'] == 5
+
+    def test_walking_pages_by_price_breaks_ties_on_title(self, api_client, products, monkeypatch):
+        monkeypatch.setattr('store.paginations.KeysetPagination.page_size', 2)
+
+        titles = walk(api_client, '/store/products/?cursor=&ordering=price')
+
+        assert titles == ['c', 'a', 'b', 'e', 'd']
+
+    def test_walking_pages_descending_breaks_ties_on_title(self, api_client, products, monkeypatch):
+        monkeypatch.setattr('store.paginations.KeysetPagination.page_size', 2)
+
+        titles = walk(api_client, '/store/products/?cursor=&ordering=-price')
+
+        assert titles == ['d', 'a', 'b', 'e', 'c']
+
+    def test_previous_link_returns_previous_page(self, api_client, products, monkeypatch):
+        monkeypatch.setattr('store.paginations.KeysetPagination.page_size', 2)
+        first = api_client.get('/store/products/?cursor=&ordering=price')
+        second = api_client.get(first.data['next'])
+
+        response = api_client.get(second.data['previous'])
+
+        assert [p['title'] for p in response.data['results']] == ['c', 'a']
+
+    def test_if_cursor_is_invalid_returns_404(self, api_client, products):
+        response = api_client.get('/store/products/?cursor=cD1nYXJiYWdl')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_page_is_given_uses_page_number_pagination(self, api_client, products):
+        response = api_client.get('/store/products/?page=1')
+
+        assert response.data['count'] == 5
@@ -0,0 +1,123 @@
+import re
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from store.models import Cart, CartItem, Collection, Order, OrderItem, Product, ProductImage
+import pytest
+from model_bakery import baker
+
+
+SQLITE_TABLE_SCAN = re.compile(r'^SCAN (TABLE )?(\w+)$')
+
+
+def explain_full_scans(sql):
+    """
+    Returns the tables a query reads with a full table scan.
+
+    Scans of an index (e.g. walking the ordering index for a LIMIT) are fine,
+    what fails is reading a table without any usable index.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [
+                match.group(2) for match in
+                (SQLITE_TABLE_SCAN.match(row[-1]) for row in cursor.fetchall())
+                if match
+            ]
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}')
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            # Tiny test tables are scanned whatever the indexes are, so only
+            # fail when no index could have been used at all.
+            return [
+                row['table'] for row in rows
+                if row['type'] == 'ALL' and not row['possible_keys']
+            ]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+    pytest.skip(f'No plan inspection for {connection.vendor}')
+
+
+@pytest.fixture
+def catalog():
+    collection = baker.make(Collection)
+    products = baker.make(Product, collection=collection, price=Decimal(10), _quantity=12)
+    baker.make(ProductImage, product=products[0], image='store/images/a.jpg')
+    return collection, products
+
+
+@pytest.fixture
+def assert_no_full_scans(api_client, without_silk):
+    def do_assert_no_full_scans(url):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+        assert response.status_code == 200
+
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        assert selects
+        plans = {sql: explain_full_scans(sql) for sql in selects}
+        scanned = {sql: tables for sql, tables in plans.items() if tables}
+        assert not scanned, f'Full table scans for {url}: {scanned}'
+    return do_assert_no_full_scans
+
+
+@pytest.mark.django_db
+class TestProductListPlans:
+    @pytest.mark.parametrize('query', [
+        '',
+        '?page=2',
+        '?collection_id={collection}&price__gt=5&price__lt=50',
+        '?collection_id={collection}&ordering=price',
+        '?cursor=&ordering=price',
+        '?cursor=&ordering=-last_update',
+        '?cursor=',
+    ])
+    def test_product_list_uses_indexes(self, assert_no_full_scans, authenticate, catalog, query):
+        authenticate()
+        collection, _ = catalog
+
+        assert_no_full_scans('/store/products/' + query.format(collection=collection.id))
+
+
+@pytest.mark.django_db
+class TestCartPlans:
+    def test_cart_items_use_indexes(self, assert_no_full_scans, catalog):
+        _, products = catalog
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=products[0], quantity=1)
+
+        assert_no_full_scans(f'/store/carts/{cart.id}/')
+        assert_no_full_scans(f'/store/carts/{cart.id}/items/')
+
+
+@pytest.mark.django_db
+class TestOrderPlans:
+    def test_customer_order_list_uses_indexes(self, assert_no_full_scans, api_client, customer, catalog):
+        _, products = catalog
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, product=products[0], quantity=1)
+        api_client.force_authenticate(user=customer.user)
+
+        assert_no_full_scans('/store/orders/')
+
+    @pytest.mark.parametrize('query', [
+        '',
+        '?payment_status=C',
+        '?placed_at__gte=2020-01-01T00:00:00Z',
+    ])
+    def test_staff_order_list_uses_indexes(self, assert_no_full_scans, authenticate, customer, catalog, query):
+        _, products = catalog
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, product=products[0], quantity=1)
+        authenticate(is_staff=True)
+
+        assert_no_full_scans('/store/orders/' + query)
@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from store.models import Collection, DailyCollectionSales, DailyProductSales, Order, OrderItem, Product
+from store.payments import update_payment_statuses
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture
+def paid_order(customer):
+    def do_paid_order(*lines, payment_status=Order.PAYMENT_STATUS_COMPLETE):
+        order = baker.make(Order, customer=customer)
+        for product, quantity, unit_price in lines:
+            baker.make(OrderItem, order=order, product=product, quantity=quantity, unit_price=unit_price)
+        update_payment_statuses({order.id: payment_status})
+        order.payment_status = payment_status
+        return order
+    return do_paid_order
+
+
+def product_sales():
+    return list(DailyProductSales.objects.order_by('product_id').values_list('product_id', 'units', 'revenue'))
+
+
+@pytest.mark.django_db
+class TestSalesRollups:
+    def test_completed_payments_are_rolled_up(self, paid_order):
+        collection = baker.make(Collection)
+        mug, cup = baker.make(Product, collection=collection, _quantity=2)
+
+        paid_order((mug, 2, Decimal('1.50')), (cup, 1, Decimal(4)))
+        paid_order((mug, 1, Decimal('1.50')))
+        paid_order((cup, 5, Decimal(4)), payment_status=Order.PAYMENT_STATUS_FAILED)
+
+        today = timezone.localdate()
+        assert product_sales() == [(mug.id, 3, Decimal('4.50')), (cup.id, 1, Decimal(4))]
+        assert list(DailyCollectionSales.objects.values_list('date', 'collection_id', 'units', 'revenue')) == \
+            [(today, collection.id, 4, Decimal('8.50'))]
+
+    def test_reverted_payments_are_taken_back(self, paid_order):
+        product = baker.make(Product)
+        order = paid_order((product, 2, Decimal(3)))
+
+        update_payment_statuses({order.id: Order.PAYMENT_STATUS_FAILED})
+
+        assert product_sales() == [(product.id, 0, Decimal(0))]
+
+    def test_backfill_matches_incremental_updates(self, paid_order):
+        products = baker.make(Product, _quantity=2)
+        old = paid_order((products[0], 1, Decimal(2)))
+        Order.objects.filter(pk=old.pk).update(placed_at=timezone.now() - timedelta(days=20))
+        paid_order((products[1], 3, Decimal(1)))
+        DailyProductSales.objects.all().delete()
+        DailyCollectionSales.objects.all().delete()
+        stdout = StringIO()
+
+        call_command('backfill_sales_rollups', '--days', '3', stdout=stdout)
+
+        assert sorted(DailyProductSales.objects.values_list('date', 'product_id', 'units', 'revenue')) == [
+            (timezone.localdate() - timedelta(days=20), products[0].id, 1, Decimal(2)),
+            (timezone.localdate(), products[1].id, 3, Decimal(3)),
+        ]
+        assert DailyCollectionSales.objects.count() == 2
+        assert '2 daily product row(s) written.' in stdout.getvalue()
+
+
+@pytest.mark.django_db
+class TestPaymentStatusPatch:
+    def test_repeated_patch_counts_revenue_once(self, api_client, authenticate, customer):
+        authenticate(is_staff=True)
+        product = baker.make(Product)
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, product=product, quantity=2, unit_price=Decimal(10))
+
+        for _ in range(2):
+            response = api_client.patch(f'/store/orders/{order.id}/', {'payment_status': 'C'})
+            assert response.status_code == status.HTTP_200_OK
+
+        assert product_sales() == [(product.id, 2, Decimal(20))]
+
+    def test_if_customer_patches_own_order_returns_403(self, api_client, customer):
+        order = baker.make(Order, customer=customer)
+        api_client.force_authenticate(user=customer.user)
+
+        response = api_client.patch(f'/store/orders/{order.id}/', {'payment_status': 'C'})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert Order.objects.get().payment_status == Order.PAYMENT_STATUS_PENDING
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentPaymentStatusPatch:
+    def test_concurrent_patches_count_revenue_once(
+            self, customer, without_silk, concurrent_transactions):
+        product = baker.make(Product)
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, product=product, quantity=2, unit_price=Decimal(10))
+
+        staff = baker.make('core.User', is_staff=True)
+
+        def complete(_):
+            client = APIClient()
+            client.force_authenticate(user=staff)
+            try:
+                return client.patch(f'/store/orders/{order.id}/', {'payment_status': 'C'}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(complete, range(16)))
+
+        assert statuses == [status.HTTP_200_OK] * 16
+        assert product_sales() == [(product.id, 2, Decimal(20))]
+        assert DailyCollectionSales.objects.get().revenue == Decimal(20)
+
+
+@pytest.mark.django_db
+class TestSalesAnalytics:
+    def test_if_user_is_not_admin_returns_403(self, api_client, authenticate):
+        authenticate()
+
+        response = api_client.get('/store/analytics/product-sales/')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_reads_only_the_rollups(
+            self, api_client, authenticate, without_silk, django_assert_num_queries):
+        authenticate(is_staff=True)
+        product = baker.make(Product)
+        today = timezone.localdate()
+        for days in range(3):
+            baker.make(DailyProductSales, product=product, date=today - timedelta(days=days),
+                       units=1, revenue=Decimal(2))
+
+        with django_assert_num_queries(1) as context:
+            response = api_client.get(
+                '/store/analytics/product-sales/',
+                {'product_id': product.id, 'date__gte': (today - timedelta(days=1)).isoformat()})
+
+        assert 'store_orderitem' not in context.captured_queries[0]['sql']
+        assert [row['date'] for row in response.data['results']] == \
+            [today.isoformat(), (today - timedelta(days=1)).isoformat()]
@@ -0,0 +1,68 @@
+from store.models import Product
+from store.search import product_index
+from rest_framework import status
+import pytest
+from model_bakery import baker
+
+
+@pytest.fixture(autouse=True)
+def clear_index():
+    product_index.clear()
+    yield
+    product_index.clear()
+
+
+def search(api_client, term):
+    response = api_client.get('/store/products/', {'search': term})
+    assert response.status_code == status.HTTP_200_OK
+    return [product['title'] for product in response.data['results']]
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def test_if_term_matches_title_over_description_ranks_title_first(self, api_client):
+        baker.make(Product, title='Plain mug', description='Coffee with milk')
+        baker.make(Product, title='Coffee mug', description='Ceramic')
+        baker.make(Product, title='Tea pot', description='Porcelain')
+
+        assert search(api_client, 'coffee') == ['Coffee mug', 'Plain mug']
+
+    def test_if_several_terms_are_given_all_must_match(self, api_client):
+        baker.make(Product, title='Coffee mug', description='')
+        baker.make(Product, title='Coffee beans', description='')
+
+        assert search(api_client, 'coffee mug') == ['Coffee mug']
+
+    def test_every_match_is_counted_and_paged(self, api_client):
+        baker.make(Product, title='Coffee mug', description='Blue', _quantity=1005, _bulk_create=True)
+        baker.make(Product, title='Coffee', description='', _quantity=5, _bulk_create=True)
+
+        response = api_client.get('/store/products/', {'search': 'coffee', 'page': 2})
+
+        assert response.data['count'] == 1010
+        assert [product['title'] for product in response.data['results']] == ['Coffee mug'] * 10
+
+    def test_if_term_is_a_prefix_matches(self, api_client):
+        baker.make(Product, title='Coffee mug', description='')
+
+        assert search(api_client, 'cof') == ['Coffee mug']
+
+    def test_if_product_is_updated_index_follows(self, api_client, django_capture_on_commit_callbacks):
+        product = baker.make(Product, title='Coffee mug', description='')
+        search(api_client, 'coffee')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.title = 'Tea cup'
+            product.save()
+
+        assert search(api_client, 'coffee') == []
+        assert search(api_client, 'tea') == ['Tea cup']
+
+    def test_if_product_is_deleted_it_is_not_returned(self, api_client, django_capture_on_commit_callbacks):
+        product = baker.make(Product, title='Coffee mug', description='')
+        search(api_client, 'coffee')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.delete()
+
+        assert search(api_client, 'coffee') == []
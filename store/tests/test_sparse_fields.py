@@ -0,0 +1,72 @@
+from store.models import Cart, CartItem, Order, OrderItem, Product, ProductImage
+import pytest
+from model_bakery import baker
+
+
+@pytest.mark.django_db
+class TestProductSparseFields:
+    def test_if_fields_are_given_returns_only_those(self, api_client):
+        baker.make(Product)
+
+        response = api_client.get('/store/products/?fields=id,title,price')
+
+        assert list(response.data['results'][0]) == ['id', 'title', 'price']
+
+    def test_if_omit_is_given_drops_those(self, api_client):
+        product = baker.make(Product)
+
+        response = api_client.get(f'/store/products/{product.id}/?omit=description,images')
+
+        assert 'description' not in response.data
+        assert 'images' not in response.data
+        assert 'price_with_tax' in response.data
+
+    @pytest.mark.parametrize('fast', [False, True])
+    def test_if_images_are_not_requested_they_are_not_queried(
+            self, api_client, authenticate, settings, without_silk, fast,
+            django_assert_num_queries):
+        settings.STORE_FAST_PRODUCT_LIST = fast
+        authenticate()
+        baker.make(ProductImage, image='store/images/a.jpg')
+
+        # count and page rows only
+        with django_assert_num_queries(2) as context:
+            response = api_client.get('/store/products/?fields=id,title,price')
+
+        assert 'description' not in context.captured_queries[1]['sql']
+        assert list(response.data['results'][0]) == ['id', 'title', 'price']
+
+    def test_if_method_is_not_safe_fields_are_ignored(self, api_client, authenticate):
+        authenticate(is_staff=True)
+        product = baker.make(Product)
+
+        response = api_client.patch(
+            f'/store/products/{product.id}/?fields=id', {'title': 'a'})
+
+        assert response.data['title'] == 'a'
+        assert 'price' in response.data
+
+
+@pytest.mark.django_db
+class TestCartSparseFields:
+    def test_if_items_are_omitted_they_are_not_queried(
+            self, api_client, without_silk, django_assert_num_queries):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, quantity=1)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(f'/store/carts/{cart.id}/?fields=id')
+
+        assert response.data == {'id': str(cart.id)}
+
+
+@pytest.mark.django_db
+class TestOrderSparseFields:
+    def test_if_items_are_omitted_they_are_not_returned(self, api_client, authenticate, customer):
+        authenticate(is_staff=True)
+        order = baker.make(Order, customer=customer)
+        baker.make(OrderItem, order=order, quantity=1)
+
+        response = api_client.get(f'/store/orders/{order.id}/?omit=items,customer')
+
+        assert set(response.data) == {'id', 'placed_at', 'payment_status'}
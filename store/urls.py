@@ -16,6 +16,8 @@ router.register('collections', views.CollectionViewSets)
 router.register('carts', views.CartViewSets)
 router.register('customers', views.CustomerViewSets)
 router.register('orders', views.OrderViewSets, basename='orders')
+router.register('analytics/product-sales', views.DailyProductSalesViewSet)
+router.register('analytics/collection-sales', views.DailyCollectionSalesViewSet)
 
 product_router = routers.NestedSimpleRouter(router, 'products', lookup='product')
 product_router.register('reviews', views.ReviewViewSets, basename='product-reviews')
@@ -24,7 +26,9 @@ cart_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
 cart_router.register('items', views.CartItemViewSets, basename='cart-items')
 
 #URL Config
-urlpatterns = router.urls + product_router.urls + cart_router.urls
+urlpatterns = router.urls + product_router.urls + cart_router.urls + [
+    path('cache-stats/', views.ResponseCacheStatsView.as_view(), name='cache-stats'),
+]
 
 
 # urlpatterns = [
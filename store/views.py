@@ -1,35 +1,49 @@
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models.aggregates import Count
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType, ValidationError
 from rest_framework.mixins import ListModelMixin, CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, UpdateModelMixin
 # from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
-# from rest_framework.views import APIView
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ReadOnlyModelViewSet
+from rest_framework.views import APIView
+from rest_framework.filters import OrderingFilter
 # from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, DjangoModelPermissions, DjangoModelPermissionsOrAnonReadOnly
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, AllowAny, IsAdminUser, DjangoModelPermissions, DjangoModelPermissionsOrAnonReadOnly
 
-from .models import Collection, Product, Review, Cart, CartItem, Customer, Order, \
-    OrderItem, ProductImage
-from .serializers import ProductSerializer, CollectionSerializer, ReviewSerializers, \
+from .models import Collection, Product, Review, Cart, Customer, Order, \
+    OrderItem, ProductImage, CustomerOrderSummary, DailyProductSales, DailyCollectionSales, \
+    ArchivedOrder, ArchivedOrderItem
+from .serializers import ProductSerializer, ProductListSerializer, CollectionSerializer, ReviewSerializers, \
     CartSerializers, CartItemSerializers, AddCartItemSerializer, UpdateCartItemSerializer,\
         CustomerSerializers, OrderSerializers, CreateOrderSerializers, UpdateOrderSerializer,\
-            ProductImageSerializer
-from .filters import ProductFilter
-from .paginations import DefaultPagination
+            ProductImageSerializer, CartItemOperationSerializer, CustomerOrderSummarySerializer,\
+                DailyProductSalesSerializer, DailyCollectionSalesSerializer, PaymentStatusUpdateSerializer,\
+                    get_sparse_fields
+from .filters import ArchivedOrderFilter, OrderFilter, ProductFilter, ProductSearchFilter, \
+    DailyProductSalesFilter, DailyCollectionSalesFilter
+from .paginations import DefaultPagination, KeysetPagination, OrderPagination, SalesPagination
 from .permissions import IsAdminOrReadOnly, ViewCustomerHistoryPermission
+from .cache import CachedResponseMixin, get_stats
+from .importers import READERS, ProductImporter, iter_lines
+from .exporters import WRITERS, iter_catalog
+from .carts import get_cart_store
+from .idempotency import get_stored_response, request_fingerprint, store_response
+from .payments import update_payment_statuses
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-class ProductViewSets(ModelViewSet):
+class ProductViewSets(CachedResponseMixin, ModelViewSet):
     
     queryset = Product.objects.prefetch_related('images').all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     # filterset_fields = ['collection_id']
     filterset_class = ProductFilter # Filter Data
     # pagination_class = PageNumberPagination
@@ -37,6 +51,32 @@ class ProductViewSets(ModelViewSet):
     search_fields = ['title', 'description'] #, 'collection__title' # Searching Data
     ordering_fields = ['price', 'last_update']
     permission_classes = [IsAdminOrReadOnly]
+    cache_models = ['product', 'productimage', 'collection', 'promotion']
+    
+    # Columns only some fields need. Ordering and pagination columns are
+    # always loaded.
+    field_columns = {
+        'description': 'description',
+        'slug': 'slug',
+        'inventory': 'inventory',
+        'collection': 'collection_id',
+    }
+    
+    def get_queryset(self):
+        fields = get_sparse_fields(self.request, ProductSerializer.Meta.fields)
+        unused = [
+            column for field, column in self.field_columns.items()
+            if field not in fields
+        ]
+        if self.action == 'list' and settings.STORE_FAST_PRODUCT_LIST:
+            return Product.objects.values(*[
+                column for column in ProductListSerializer.columns
+                if column not in unused
+            ])
+        queryset = Product.objects.defer(*unused)
+        if 'images' in fields:
+            queryset = queryset.prefetch_related('images')
+        return queryset
     
     # def get_queryset(self):
     #     queryset = Product.objects.all()
@@ -45,21 +85,81 @@ class ProductViewSets(ModelViewSet):
     #         queryset = queryset.filter(collection_id=collection_id)
     #     return queryset
     
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets', '').lower() in ('1', 'true') \
+                and response.status_code == status.HTTP_200_OK:
+            queryset = ProductSearchFilter().filter_queryset(
+                request, self.get_queryset(), self)
+            filterset = ProductFilter(request.query_params, queryset=queryset, request=request)
+            if filterset.is_valid():
+                response.data['facets'] = filterset.get_facets()
+        return response
+    
+    @property
+    def paginator(self):
+        # Clients opt into keyset pagination by sending `?cursor=`, the first
+        # page being an empty cursor; `?page=N` keeps working as before.
+        if not hasattr(self, '_paginator'):
+            if KeysetPagination.cursor_query_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+    
     def get_serializer_context(self):
         return {'request': self.request}
     
+    @action(detail=False, methods=['POST'], url_path='import', permission_classes=[IsAdminUser])
+    def bulk_import(self, request):
+        # The body is read line by line from the request stream, never
+        # through request.data, so the file is never loaded as a whole.
+        content_types = {
+            'text/csv': 'csv',
+            'application/x-ndjson': 'ndjson',
+        }
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type not in content_types:
+            raise UnsupportedMediaType(content_type)
+        
+        batch_size = settings.STORE_IMPORT_BATCH_SIZE
+        if request.query_params.get('batch_size', '').isdigit():
+            batch_size = max(int(request.query_params['batch_size']), 1)
+        
+        if request.stream is None:
+            raise ParseError('The request body is empty.')
+        read = READERS[content_types[content_type]]
+        report = ProductImporter(batch_size).run(read(iter_lines(request.stream)))
+        return Response(report)
+    
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def export(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in WRITERS:
+            return Response(
+                {'output': [f'Must be one of: {", ".join(WRITERS)}.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        
+        write, content_type = WRITERS[output]
+        response = StreamingHttpResponse(
+            write(iter_catalog(request, settings.STORE_EXPORT_CHUNK_SIZE)),
+            content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{output}"'
+        return response
+    
     def delete(self, request, pk):
         product = get_object_or_404(Product, pk=pk)
-        if product.orderitem.count() > 0:
+        if product.orderitem.exists() or product.archived_orderitem.exists():
             return Response({'Product Can not be Deleted. It has been Associated with an order'},status=status.HTTP_405_METHOD_NOT_ALLOWED)
         product.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CollectionViewSets(ModelViewSet):
-    queryset = Collection.objects.annotate(products_count=Count('products')).all()
+class CollectionViewSets(CachedResponseMixin, ModelViewSet):
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_models = ['collection', 'product']
     def delete(self, request, pk):
         collection = get_object_or_404(Collection, pk=pk)
         if collection.products.count() > 0:
@@ -82,8 +182,23 @@ class CartViewSets(CreateModelMixin,
                   RetrieveModelMixin, 
                   DestroyModelMixin, 
                   GenericViewSet):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    # Reads and writes go through the configured cart store
+    # (STORE_CART_BACKEND), the queryset is only used by the router.
+    queryset = Cart.objects.all()
     serializer_class = CartSerializers
+    
+    def get_object(self):
+        fields = get_sparse_fields(self.request, CartSerializers.Meta.fields)
+        cart = get_cart_store().get_cart(
+            self.kwargs['pk'], with_items='items' in fields, with_total='total_price' in fields)
+        self.check_object_permissions(self.request, cart)
+        return cart
+    
+    def perform_create(self, serializer):
+        serializer.instance = get_cart_store().create_cart()
+    
+    def perform_destroy(self, instance):
+        get_cart_store().delete_cart(instance.id)
 
 
 class CartItemViewSets(ModelViewSet):
@@ -100,10 +215,42 @@ class CartItemViewSets(ModelViewSet):
         return {'cart_id': self.kwargs['cart_pk']}
 
     def get_queryset(self):
-        return CartItem.objects\
-            .filter(cart_id=self.kwargs['cart_pk'])\
-            .select_related('product')
+        return get_cart_store().get_items(self.kwargs['cart_pk'])
+    
+    def get_object(self):
+        item = get_cart_store().get_item(self.kwargs['cart_pk'], self.kwargs['pk'])
+        self.check_object_permissions(self.request, item)
+        return item
+    
+    def perform_update(self, serializer):
+        serializer.instance = get_cart_store().update_item(
+            self.kwargs['cart_pk'], serializer.instance, serializer.validated_data['quantity'])
+    
+    def perform_destroy(self, instance):
+        get_cart_store().remove_item(self.kwargs['cart_pk'], instance)
     
+    @action(detail=False, methods=['POST'])
+    def batch(self, request, cart_pk):
+        serializer = CartItemOperationSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        cart = get_cart_store().apply_batch(cart_pk, serializer.validated_data)
+        return Response(CartSerializers(cart).data)
+    
+def use_archive(request):
+    # `?archived=true` reads archived orders (see store.archive), they
+    # render with the same serializers as the live ones
+    return request.method in SAFE_METHODS and request.query_params.get('archived') == 'true'
+
+
+def prefetch_order_items(order_items=OrderItem):
+    # One query for the items of a whole page of orders, joined to the
+    # product columns SimpleProductSerializer renders
+    return Prefetch('items', queryset=order_items.objects
+        .select_related('product')
+        .only('id', 'order_id', 'quantity', 'unit_price',
+              'product__id', 'product__title', 'product__price'))
+
+
 class CustomerViewSets(ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializers
@@ -111,7 +258,21 @@ class CustomerViewSets(ModelViewSet):
     
     @action(detail=True, permission_classes=[ViewCustomerHistoryPermission])
     def history(self, request, pk):
-        return Response('ok')
+        # The totals come from the precomputed summary row, only the page
+        # of recent orders is read from the order tables.
+        customer = self.get_object()
+        summary = CustomerOrderSummary.objects.filter(customer=customer).first() \
+            or CustomerOrderSummary(customer=customer)
+        
+        orders, order_items = (ArchivedOrder, ArchivedOrderItem) if use_archive(request) \
+            else (Order, OrderItem)
+        paginator = OrderPagination()
+        orders = paginator.paginate_queryset(
+            orders.objects.filter(customer=customer).prefetch_related(prefetch_order_items(order_items)),
+            request, self)
+        response = paginator.get_paginated_response(OrderSerializers(orders, many=True).data)
+        response.data = {'summary': CustomerOrderSummarySerializer(summary).data, **response.data}
+        return response
     
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request):
@@ -130,19 +291,82 @@ class CustomerViewSets(ModelViewSet):
        
 class OrderViewSets(ModelViewSet):
     http_method_names = ['get','post', 'patch', 'delete', 'head', 'option']
+    filter_backends = [DjangoFilterBackend]
+    pagination_class = OrderPagination
+    archived = False
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.archived = use_archive(request)
+    
+    @property
+    def filterset_class(self):
+        return ArchivedOrderFilter if self.archived else OrderFilter
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Archived orders stay readable under their ids, never writable
+            if self.archived or self.request.method not in SAFE_METHODS:
+                raise
+            self.archived = True
+            return super().get_object()
     
     def get_permissions(self):
-        if self.request.method in ['PATCH', 'DELETE']:
+        # PATCH only changes the payment status, which customers must not set
+        if self.action == 'bulk_payment_status' or self.request.method == 'PATCH':
+            return [IsAdminUser()]
+        if self.request.method == 'DELETE':
             return [IsAuthenticated()]
         return [IsAuthenticated()]
 
     
     def create(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return Response(self.place_order(request))
+        if not key or len(key) > 255:
+            return Response(
+                {'detail': 'Idempotency-Key must be 1 to 255 characters long.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        
+        # A replay is served from the stored response without touching the
+        # cart or order tables.
+        fingerprint = request_fingerprint(request.data)
+        stored = get_stored_response(request.user.id, key)
+        if stored is None:
+            try:
+                with transaction.atomic():
+                    data = self.place_order(request)
+                    store_response(request.user.id, key, fingerprint, data)
+                return Response(data)
+            except (IntegrityError, ValidationError):
+                # A concurrent request with the same key may have won
+                stored = get_stored_response(request.user.id, key)
+                if stored is None:
+                    raise
+        if stored['request_hash'] != fingerprint:
+            return Response(
+                {'detail': 'Idempotency-Key was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(stored['response'], headers={'Idempotent-Replayed': 'true'})
+    
+    @action(detail=False, methods=['POST'], url_path='payment-status')
+    def bulk_payment_status(self, request):
+        serializer = PaymentStatusUpdateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        # A later entry for the same order wins
+        statuses = {update['id']: update['payment_status'] for update in serializer.validated_data}
+        report = update_payment_statuses(statuses, settings.STORE_PAYMENT_STATUS_BATCH_SIZE)
+        return Response(report)
+    
+    def place_order(self, request):
         serializer = CreateOrderSerializers(data=request.data, context={'user_id': self.request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
         serializer = OrderSerializers(order)
-        return Response(serializer.data)
+        return serializer.data
         
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -152,16 +376,52 @@ class OrderViewSets(ModelViewSet):
         return OrderSerializers
         
     def get_queryset(self):
+        fields = get_sparse_fields(self.request, OrderSerializers.Meta.fields)
+        orders, order_items = (ArchivedOrder, ArchivedOrderItem) if self.archived \
+            else (Order, OrderItem)
+        # placed_at is always loaded, OrderPagination orders and builds its
+        # cursors on it
+        queryset = orders.objects.defer(*[
+            field for field in ['customer', 'payment_status']
+            if field not in fields
+        ])
+        if 'items' in fields:
+            queryset = queryset.prefetch_related(prefetch_order_items(order_items))
+        
         user = self.request.user
         if user.is_staff:
-            return Order.objects.all()
-         
-        customer_id = Customer.objects.only('id').get(user_id=user.id)
+            return queryset
         
-        return Order.objects.filter(customer_id=customer_id)    
+        return queryset.filter(customer__user_id=user.id)
        
        
        
+class DailyProductSalesViewSet(ReadOnlyModelViewSet):
+    # Reads only the rollup tables, never OrderItem
+    queryset = DailyProductSales.objects.all()
+    serializer_class = DailyProductSalesSerializer
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DailyProductSalesFilter
+    pagination_class = SalesPagination
+
+
+class DailyCollectionSalesViewSet(ReadOnlyModelViewSet):
+    queryset = DailyCollectionSales.objects.all()
+    serializer_class = DailyCollectionSalesSerializer
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DailyCollectionSalesFilter
+    pagination_class = SalesPagination
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
+
+
 class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
 
@@ -1 +1 @@
-# from .celery import celery
\ No newline at end of file
+from .celery import celery
@@ -1,7 +1,7 @@
-# import os
-# from celery import Celery
+import os
+from celery import Celery
 
-# os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings')
-# celery = Celery('storefront')
-# celery.config_from_object('django.conf:settings', namespace='CELERY')
-# celery.autodiscover_tasks()
\ No newline at end of file
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings')
+celery = Celery('storefront')
+celery.config_from_object('django.conf:settings', namespace='CELERY')
+celery.autodiscover_tasks()
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 from datetime import timedelta
-# from celery.schedules import crontab
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -104,6 +104,17 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    #     'LOCATION': 'redis://localhost:6379/2',
+    # }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -171,6 +182,67 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = 'core.User'
 
+# 'database' uses the MySQL FULLTEXT index, 'memory' an in-process index
+# (also used automatically on databases without a native index).
+STORE_SEARCH_BACKEND = 'database'
+
+# Anonymous product/collection GETs are cached this many seconds at most,
+# writes invalidate them right away.
+STORE_RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+# Serialize product list pages from values() rows instead of model
+# instances (same output, see ProductListSerializer).
+STORE_FAST_PRODUCT_LIST = False
+
+# Rows per bulk_create/bulk_update batch for product imports.
+STORE_IMPORT_BATCH_SIZE = 500
+
+# Rejected rows reported in detail by a product import, the rest are
+# only counted.
+STORE_IMPORT_MAX_ERRORS = 100
+
+# Products read per query by the streaming catalog export.
+STORE_EXPORT_CHUNK_SIZE = 1000
+
+# Boundaries of the price facet buckets returned with ?facets=true:
+# below 10, 10 to 50, 50 to 100 and 100 or more.
+STORE_PRODUCT_PRICE_BUCKETS = [10, 50, 100]
+
+# 'store.carts.CacheCartStore' keeps carts in the cache and writes them to
+# the database on checkout or when store.tasks.flush_carts runs. It needs a
+# cache that never evicts entries (Redis with maxmemory-policy noeviction).
+STORE_CART_BACKEND = 'store.carts.DatabaseCartStore'
+STORE_CART_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Carts not updated for STORE_CART_TTL seconds are deleted by the
+# reap_carts command/task, STORE_CART_REAP_BATCH_SIZE carts at a time.
+STORE_CART_TTL = 60 * 60 * 24 * 30
+STORE_CART_REAP_BATCH_SIZE = 1000
+
+# order_created receivers run after checkout commits: 'celery' through
+# store.tasks.dispatch_order_events, 'eager' in the same process (tests).
+# Events left pending are retried by the periodic dispatch_order_events task,
+# those failing store.events.MAX_ATTEMPTS times are logged as critical and
+# wait for the replay_order_events command.
+STORE_ORDER_EVENT_DISPATCH = 'celery'
+STORE_ORDER_EVENT_BATCH_SIZE = 100
+
+# How long responses to Idempotency-Key order requests are kept, in the
+# cache and in the IdempotencyKey table.
+STORE_IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+# Rows older than that are deleted by the prune_idempotency_keys
+# command/task, STORE_IDEMPOTENCY_KEY_PRUNE_BATCH_SIZE rows at a time.
+STORE_IDEMPOTENCY_KEY_PRUNE_BATCH_SIZE = 1000
+
+# Orders per UPDATE batch of POST /store/orders/payment-status/
+STORE_PAYMENT_STATUS_BATCH_SIZE = 1000
+
+# Completed orders placed more than STORE_ORDER_ARCHIVE_AFTER_DAYS days ago
+# are moved to the archive tables by the archive_orders command/task,
+# STORE_ORDER_ARCHIVE_BATCH_SIZE orders at a time.
+STORE_ORDER_ARCHIVE_AFTER_DAYS = 365
+STORE_ORDER_ARCHIVE_BATCH_SIZE = 500
+
 DJOSER = {
     'SERIALIZERS': {
         'user_create': 'core.serializers.UserCreateSerializer',
@@ -198,11 +270,35 @@ SIMPLE_JWT = {
 
 
 # Edis and celery setup 
-# CELERY_BROKER_URL = 'redis://localhost:6379/1'
+CELERY_BROKER_URL = 'redis://localhost:6379/1'
+CELERY_BEAT_SCHEDULE = {
+    # Retries order_created events whose dispatch failed or was lost
+    'dispatch_order_events': {
+        'task': 'store.tasks.dispatch_order_events',
+        'schedule': 60,
+    },
+    'prune_idempotency_keys': {
+        'task': 'store.tasks.prune_idempotency_keys',
+        'schedule': 60 * 60,
+    },
+    # Writes carts kept by CacheCartStore to the database
+    'flush_carts': {
+        'task': 'store.tasks.flush_carts',
+        'schedule': 60,
+    },
+    'reap_carts': {
+        'task': 'store.tasks.reap_carts',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'archive_orders': {
+        'task': 'store.tasks.archive_orders',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
 # CELERY_BEAT_SCHEDULE = {
 #     'notify_customers': {
 #         'task': 'playground.tasks.notify_customers',
 #         'schedule': 5,  # crontab(day_of_week=1, hour=7, minute=30)
 #         'args': ['Hellow World']
-#     }
+#     },
 # }
\ No newline at end of file